@@ -260,8 +260,36 @@ RECOMMENDER_PLAYLIST_PUBLIC = _bool_env("RECOMMENDER_PLAYLIST_PUBLIC", default=F
 RECOMMENDER_DEBUG_VIEW_ENABLED = _bool_env("RECOMMENDER_DEBUG_VIEW_ENABLED", default=DEBUG)
 RECOMMENDER_CACHE_TIMEOUT_SECONDS = _int_env("RECOMMENDER_CACHE_TIMEOUT_SECONDS", 60 * 15)
 RECOMMENDER_OPENAI_MODEL = os.getenv("RECOMMENDER_OPENAI_MODEL", "gpt-4o-mini")
+RECOMMENDER_OPENAI_ATTRIBUTE_MODEL = os.getenv("RECOMMENDER_OPENAI_ATTRIBUTE_MODEL", "gpt-4.1-nano")
 RECOMMENDER_OPENAI_TEMPERATURE = _float_env("RECOMMENDER_OPENAI_TEMPERATURE", 0.7)
 RECOMMENDER_OPENAI_MAX_TOKENS = _int_env("RECOMMENDER_OPENAI_MAX_TOKENS", 512)
+RECOMMENDER_LLM_CACHE_SECONDS = _int_env("RECOMMENDER_LLM_CACHE_SECONDS", 60 * 15)
+RECOMMENDER_ARTIST_CACHE_SECONDS = _int_env("RECOMMENDER_ARTIST_CACHE_SECONDS", 60 * 60)
+RECOMMENDER_SPOTIFY_SEARCH_CACHE_SECONDS = _int_env(
+    "RECOMMENDER_SPOTIFY_SEARCH_CACHE_SECONDS", 60 * 10
+)
+RECOMMENDER_SPOTIFY_REQUEST_THREADS = _int_env("RECOMMENDER_SPOTIFY_REQUEST_THREADS", 4)
+RECOMMENDER_OPENAI_TIMEOUT_SECONDS = _float_env("RECOMMENDER_OPENAI_TIMEOUT_SECONDS", 8.0)
+RECOMMENDER_OPENAI_RETRY_TIMEOUT_SECONDS = _float_env(
+    "RECOMMENDER_OPENAI_RETRY_TIMEOUT_SECONDS", 20.0
+)
+
+# Playlist payloads and user profile snapshots live in the default cache. Short-lived
+# lookups (LLM responses, Spotify artists and searches) churn far faster, so they get
+# their own bounded cache instead of evicting those entries.
+RECOMMENDER_LOOKUP_CACHE_ALIAS = "recommender_lookups"
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "aiplaylist-default",
+        "OPTIONS": {"MAX_ENTRIES": _int_env("DJANGO_CACHE_MAX_ENTRIES", 1000)},
+    },
+    RECOMMENDER_LOOKUP_CACHE_ALIAS: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "recommender-lookups",
+        "OPTIONS": {"MAX_ENTRIES": _int_env("RECOMMENDER_LOOKUP_CACHE_MAX_ENTRIES", 5000)},
+    },
+}
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_API_BASE = os.getenv("OPENAI_API_BASE")
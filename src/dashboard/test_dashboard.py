@@ -13,6 +13,7 @@ from spotipy.exceptions import SpotifyException
 
 from recommender.models import SavedPlaylist, UniqueLike
 from recommender.services.session_utils import ensure_session_key
+from recommender.services.spotify_handler import _shared_requests_session
 from dashboard.views import (
     _resolve_generation_identifier,
     _fetch_spotify_highlights,
@@ -469,7 +470,9 @@ class DashboardViewTests(TestCase):
         self.client.get(self.dashboard_url)
 
         # Verify Spotify client was created with correct token
-        mock_spotify.assert_called_once_with(auth='my_test_token')
+        mock_spotify.assert_called_once_with(
+            auth='my_test_token', requests_session=_shared_requests_session()
+        )
 
     @patch('dashboard.views.spotipy.Spotify')
     def test_dashboard_template_content(self, mock_spotify):
@@ -805,7 +808,9 @@ class RecommendedArtistsAPITests(TestCase):
         self.assertEqual(payload['recommended_artists'], mock_get_ai.return_value)
         self.assertEqual(payload['meta']['seed_count'], 3)
         mock_get_ai.assert_called_once()
-        mock_spotify.assert_called_once_with(auth='token')
+        mock_spotify.assert_called_once_with(
+            auth='token', requests_session=_shared_requests_session()
+        )
 
 
 class DashboardIntegrationTests(TestCase):
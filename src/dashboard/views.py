@@ -22,6 +22,7 @@ from recommender.services.listening_suggestions import generate_listening_sugges
 from recommender.services.session_utils import ensure_session_key
 from recommender.services.spotify_handler import (
     _primary_image_url,
+    _spotify_client,
     build_user_profile_seed_snapshot,
 )
 from recommender.services.stats_service import (
@@ -270,7 +271,7 @@ class DashboardView(View):
         if not access_token:
             return redirect('spotify_auth:login')
 
-        sp = spotipy.Spotify(auth=access_token)
+        sp = _spotify_client(access_token)
         try:
             user_profile = sp.current_user()
             recently_played = sp.current_user_recently_played(limit=1)
@@ -377,7 +378,7 @@ class UserStatsAPIView(View):
         genre_breakdown = get_genre_breakdown(user_identifier)
 
         try:
-            sp = spotipy.Spotify(auth=access_token)
+            sp = _spotify_client(access_token)
             spotify_highlights = _fetch_spotify_highlights(request, sp)
         except spotipy.exceptions.SpotifyException:
             spotify_highlights = {'top_genres': [], 'top_artists': [], 'top_tracks': []}
@@ -447,7 +448,7 @@ class RecommendedArtistsAPIView(View):
             requested_limit = 8
         limit = max(1, min(requested_limit, 12))
 
-        sp = spotipy.Spotify(auth=access_token)
+        sp = _spotify_client(access_token)
         profile_cache = cache.get(f"recommender:user-profile:{user_id}") if user_id else None
         recommended_artists = _get_ai_artist_suggestions(
             request,
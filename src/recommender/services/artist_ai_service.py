@@ -10,7 +10,8 @@ from spotipy import Spotify, SpotifyException
 
 from .artist_card_utils import basic_artist_payload, build_artist_card
 from .artist_recommendation_service import fetch_seed_artists
-from .llm_handler import _parse_json_response, dispatch_llm_query
+from .llm_handler import dispatch_llm_query
+from .llm_json import _parse_json_response
 from .spotify_handler import _normalize_artist_key, _primary_image_url
 
 try:
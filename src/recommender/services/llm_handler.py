@@ -5,22 +5,57 @@
 # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
 # pylint: disable=too-many-branches,too-many-statements
 
+import functools
+import hashlib
 import json
 import logging
 import os
 import re
-from threading import local
-from typing import Any, Callable, Dict, List, Optional, Set
-
-from openai import OpenAI, OpenAIError
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from threading import Lock
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from .llm_json import (
+    _DASH_SPLIT,
+    _coerce_track_list,
+    _json_array_closed,
+    _parse_json_response,
+    _track_array_limit_reached,
+)
+from .llm_streaming import (
+    _capture_openai_usage,
+    _create_response,
+    _openai_errors,
+    _stream_openai_text,
+)
+
+if TYPE_CHECKING:  # pragma: no cover - the SDK is imported on first client use
+    from openai import OpenAI
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_ATTRIBUTES = {"mood": "chill", "genre": "pop", "energy": "medium"}
 try:
     from django.conf import settings as django_settings  # type: ignore
+    from django.core.cache import caches as django_caches  # type: ignore
+    from django.core.cache.backends.base import InvalidCacheBackendError  # type: ignore
+    from django.core.signals import setting_changed  # type: ignore
 except ImportError:  # pragma: no cover - optional dependency in some contexts
     DJANGO_SETTINGS = None
+    django_caches = None
+    setting_changed = None
 else:
     DJANGO_SETTINGS = django_settings
 
@@ -68,71 +103,218 @@ _GENRE_FALLBACKS = {
         {"title": "Moonlight Sonata", "artist": "Ludwig van Beethoven"},
     ],
 }
-_DEFAULT_FALLBACKS = [
+_DEFAULT_FALLBACKS = (
     {"title": "Dreams", "artist": "Fleetwood Mac"},
     {"title": "Africa", "artist": "Toto"},
     {"title": "Uptown Funk", "artist": "Mark Ronson ft. Bruno Mars"},
     {"title": "Stayin' Alive", "artist": "Bee Gees"},
     {"title": "September", "artist": "Earth, Wind & Fire"},
-]
-
-_CLIENT_STATE: Dict[str, Optional[OpenAI]] = {"client": None}
-_JSON_CODE_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.IGNORECASE | re.DOTALL)
-_THREAD_STATE = local()
+)
+
+# Fixed prompt fragments are built once; each call only joins in the variable parts.
+_ATTRIBUTE_PROMPT_PREFIX = (
+    "Extract the mood, genre, energy level, and any explicitly referenced primary artists "
+    "or bands from this user playlist request. Respond with JSON containing the keys "
+    "`mood`, `genre`, and `energy`, plus optional `artist` (string) and `artists` "
+    "(array of strings) when specific performers are mentioned. "
+    "If no artist is present, set those fields to null or an empty list. "
+    "Request: "
+)
+_PLAN_PROMPT_PREFIX = (
+    "Plan a Spotify playlist for this user request in one step. Respond with a single "
+    "JSON object with two keys. `attributes`: an object with the keys `mood`, `genre`, "
+    "and `energy`, plus optional `artist` (string) and `artists` (array of strings) when "
+    "specific performers are mentioned; set those to null or an empty list otherwise. "
+    "`seeds`: a JSON array with at most "
+)
+_PLAN_PROMPT_SUFFIX = (
+    " objects, each containing the keys \"title\" and \"artist\". Choose well-known "
+    "songs that fit the mood/genre/energy and are likely available on Spotify.\n"
+    "Request: "
+)
+# Structured-output formats passed as ``text.format`` so the API only emits valid JSON.
+_JSON_OBJECT_FORMAT: Dict[str, Any] = {"type": "json_object"}
+_SEED_TRACKS_FORMAT: Dict[str, Any] = {
+    "type": "json_schema",
+    "name": "seed_tracks",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "tracks": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"title": {"type": "string"}, "artist": {"type": "string"}},
+                    "required": ["title", "artist"],
+                    "additionalProperties": False,
+                },
+            }
+        },
+        "required": ["tracks"],
+        "additionalProperties": False,
+    },
+}
+_SEED_PROMPT_PREFIX = (
+    "You are selecting seed songs for a Spotify playlist.\n"
+    "Playlist request: \""
+)
+_SEED_PROMPT_ATTRIBUTES = "\"\nExtracted attributes: "
+_SEED_PROMPT_COUNT = "\nReturn a JSON object whose \"tracks\" array holds at most "
+_SEED_PROMPT_SUFFIX = (
+    " objects, each containing the keys "
+    "\"title\" and \"artist\". Choose well-known songs that fit the mood/genre/"
+    "energy and are likely available on Spotify."
+)
+_REMIX_PROMPT_PREFIX = (
+    "You are refreshing an existing Spotify playlist for a user.\n"
+    "Original request: \""
+)
+_REMIX_PROMPT_ATTRIBUTES = "\"\nTarget attributes: "
+_REMIX_PROMPT_TRACKS = "\nCurrent playlist tracks:\n"
+_REMIX_PROMPT_COUNT = "\n\nRemix the playlist by returning exactly "
+_REMIX_PROMPT_SUFFIX = (
+    " songs that match the same mood, genre, and energy. "
+    "You may keep some of the existing songs, but avoid duplicates overall "
+    "and ensure the list feels refreshed. Return a JSON array where each "
+    "object contains the keys \"title\" and \"artist\". Prefer well-known "
+    "tracks that are likely available on Spotify US."
+)
+_REFINE_PROMPT_PREFIX = "Given these seed tracks: "
+_REFINE_PROMPT_ATTRIBUTES = ", and attributes "
+_REFINE_PROMPT_SUFFIX = (
+    ", recommend 5 additional widely known songs that are available on Spotify US. "
+    "Return each song on a new line and prefer artists that match the requested genre."
+)
+
+_GENRE_SEPARATOR_TABLE = str.maketrans("-_", "  ")
+
+
+def _fold_genre_label(raw_genre: str) -> str:
+    """Lowercase a genre label and collapse hyphen/underscore/space runs."""
+    return " ".join(raw_genre.translate(_GENRE_SEPARATOR_TABLE).lower().split())
+
+
+_GENRE_FALLBACK_ALIASES = {
+    "hiphop": "hip hop",
+    "rap": "hip hop",
+    "edm": "electronic",
+    "electronica": "electronic",
+    "dance": "electronic",
+    "rock and roll": "rock",
+    "orchestral": "classical",
+}
+# Frozen at import: tuple values cannot be mutated through a returned reference.
+_GENRE_FALLBACKS_NORMALIZED: Dict[str, Tuple[Dict[str, str], ...]] = {
+    _fold_genre_label(genre): tuple(tracks) for genre, tracks in _GENRE_FALLBACKS.items()
+}
+_GENRE_FALLBACKS_NORMALIZED.update(
+    {
+        alias: _GENRE_FALLBACKS_NORMALIZED[target]
+        for alias, target in _GENRE_FALLBACK_ALIASES.items()
+    }
+)
+
+# Prompts made only of one genre, one mood, an optional energy level, and filler
+# words are answered without an LLM round-trip.
+_SHORTCUT_GENRE_RE = re.compile(
+    r"\b(pop|rock|hip[- ]?hop|rap|edm|electronic|dance|jazz|classical|indie|metal|"
+    r"country|r&b|rnb|folk|blues|soul|reggae|punk|lo[- ]?fi)\b"
+)
+_SHORTCUT_MOOD_RE = re.compile(
+    r"\b(chill|relaxed|calm|mellow|happy|sad|upbeat|energetic|romantic|melancholy|"
+    r"angry|dreamy|nostalgic|party|focus)\b"
+)
+_SHORTCUT_ENERGY_RE = re.compile(r"\b(low|medium|high)[- ]energy\b")
+_SHORTCUT_WORD_RE = re.compile(r"[a-z0-9&']+")
+_SHORTCUT_FILLER = frozenset(
+    (
+        "a", "an", "and", "the", "some", "of", "for", "with", "me", "my", "please", "make",
+        "create", "give", "playlist", "songs", "song", "music", "tracks", "mix", "vibes",
+        "tunes",
+    )
+)
+_SHORTCUT_MOOD_ENERGY = {
+    "chill": "low",
+    "relaxed": "low",
+    "calm": "low",
+    "mellow": "low",
+    "sad": "low",
+    "melancholy": "low",
+    "dreamy": "low",
+    "upbeat": "high",
+    "energetic": "high",
+    "party": "high",
+    "angry": "high",
+}
 
+_CLIENT_STATE: Dict[str, Optional["OpenAI"]] = {"client": None}
+# httpx drops idle keep-alive sockets after 5s by default; holding them longer lets
+# back-to-back playlist requests reuse the warm TLS connection to the API.
+_OPENAI_HTTP_LIMITS = {
+    "max_connections": 16,
+    "max_keepalive_connections": 16,
+    "keepalive_expiry": 120.0,
+}
+# Identical prompts dispatched concurrently share a single outstanding request.
+_INFLIGHT: Dict[str, "Future[str]"] = {}
+_INFLIGHT_LOCK = Lock()
+_INFLIGHT_WAIT_SECONDS = 60.0
 
-def _default_usage_bucket() -> Dict[str, int]:
-    return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
 
+def _get_setting(name: str, default=None):
+    if DJANGO_SETTINGS is not None and hasattr(DJANGO_SETTINGS, name):
+        return getattr(DJANGO_SETTINGS, name)
+    return os.getenv(name, default)
 
-def reset_llm_usage_tracker() -> None:
-    """Reset the accumulated token counters for the current thread."""
-    _THREAD_STATE.llm_usage = _default_usage_bucket()
 
+@dataclass(frozen=True)
+class _LLMConfig:
+    """Resolved OpenAI request defaults shared by every dispatch."""
+
+    openai_model: str
+    attribute_model: Optional[str]
+    openai_temperature: object
+    openai_max_tokens: object
+    response_cache_seconds: int
+    request_timeouts: Tuple[float, ...]
+
+
+@functools.lru_cache(maxsize=1)
+def _config_snapshot() -> _LLMConfig:
+    """Resolve the OpenAI request defaults once instead of on every query."""
+    return _LLMConfig(
+        openai_model=_get_setting("RECOMMENDER_OPENAI_MODEL", "gpt-4o-mini"),
+        attribute_model=_get_setting("RECOMMENDER_OPENAI_ATTRIBUTE_MODEL", "gpt-4.1-nano") or None,
+        openai_temperature=_get_setting("RECOMMENDER_OPENAI_TEMPERATURE", 0.7),
+        openai_max_tokens=_get_setting("RECOMMENDER_OPENAI_MAX_TOKENS", 512),
+        response_cache_seconds=int(_get_setting("RECOMMENDER_LLM_CACHE_SECONDS", 60 * 15) or 0),
+        request_timeouts=tuple(
+            float(seconds)
+            for seconds in (
+                _get_setting("RECOMMENDER_OPENAI_TIMEOUT_SECONDS", 8.0),
+                _get_setting("RECOMMENDER_OPENAI_RETRY_TIMEOUT_SECONDS", 20.0),
+            )
+            if seconds and float(seconds) > 0
+        ),
+    )
 
-def _usage_bucket() -> Dict[str, int]:
-    usage = getattr(_THREAD_STATE, "llm_usage", None)
-    if usage is None:
-        usage = _default_usage_bucket()
-        _THREAD_STATE.llm_usage = usage
-    return usage
 
+def _invalidate_config(**_kwargs: object) -> None:
+    """Drop the cached config snapshot so the next query re-reads settings."""
+    _config_snapshot.cache_clear()
 
-def _record_llm_usage(
-    *,
-    prompt_tokens: Optional[int] = None,
-    completion_tokens: Optional[int] = None,
-    total_tokens: Optional[int] = None,
-) -> None:
-    usage = _usage_bucket()
-    if prompt_tokens:
-        usage["prompt_tokens"] += max(int(prompt_tokens), 0)
-    if completion_tokens:
-        usage["completion_tokens"] += max(int(completion_tokens), 0)
-    if total_tokens:
-        usage["total_tokens"] += max(int(total_tokens), 0)
-
-
-def get_llm_usage_snapshot() -> Dict[str, int]:
-    """Return the current token counters for the active thread."""
-    usage = getattr(_THREAD_STATE, "llm_usage", None)
-    if not usage:
-        return _default_usage_bucket()
-    return {
-        "prompt_tokens": int(usage.get("prompt_tokens", 0)),
-        "completion_tokens": int(usage.get("completion_tokens", 0)),
-        "total_tokens": int(usage.get("total_tokens", 0)),
-    }
 
+if setting_changed is not None:
+    setting_changed.connect(_invalidate_config, dispatch_uid="llm_handler_config_snapshot")
 
-def _get_setting(name: str, default=None):
-    if DJANGO_SETTINGS is not None and hasattr(DJANGO_SETTINGS, name):
-        return getattr(DJANGO_SETTINGS, name)
-    return os.getenv(name, default)
 
+def _get_openai_client() -> Optional["OpenAI"]:
+    """Lazily initialize the shared OpenAI client.
 
-def _get_openai_client() -> Optional[OpenAI]:
-    """Lazily initialize the shared OpenAI client."""
+    The SDK (and httpx) are imported here rather than at module import: they dominate
+    this module's import time and most processes never issue an LLM call.
+    """
     if _CLIENT_STATE["client"] is not None:
         return _CLIENT_STATE["client"]
 
@@ -143,7 +325,7 @@ def _get_openai_client() -> Optional[OpenAI]:
         )
         return None
 
-    client_kwargs: Dict[str, str] = {"api_key": api_key}
+    client_kwargs: Dict[str, Any] = {"api_key": api_key}
     base_url = _get_setting("OPENAI_API_BASE")
     if base_url:
         client_kwargs["base_url"] = base_url
@@ -151,91 +333,94 @@ def _get_openai_client() -> Optional[OpenAI]:
     if organization:
         client_kwargs["organization"] = organization
 
+    import httpx  # pylint: disable=import-outside-toplevel
+    from openai import DefaultHttpxClient, OpenAI  # pylint: disable=import-outside-toplevel
+
     try:
+        client_kwargs["http_client"] = DefaultHttpxClient(
+            limits=httpx.Limits(**_OPENAI_HTTP_LIMITS)
+        )
         _CLIENT_STATE["client"] = OpenAI(**client_kwargs)
-    except (OpenAIError, ValueError) as exc:  # pragma: no cover - defensive logging
+    except _openai_errors() as exc:  # pragma: no cover - defensive logging
         logger.error("Failed to initialize OpenAI client: %s", exc)
         return None
 
     return _CLIENT_STATE["client"]
 
 
-
 def _log(
     debug_steps: Optional[List[str]],
     log_step: Optional[Callable[[str], None]],
-    message: str,
+    message: Union[str, Callable[[], str]],
 ) -> None:
-    """Collect debug output centrally so callers can display progress."""
+    """Collect debug output centrally so callers can display progress.
+
+    ``message`` may be a zero-argument callable so expensive formatting is
+    skipped entirely when no debug sink is attached.
+    """
+    if log_step is None and debug_steps is None:
+        return
+    text = message() if callable(message) else message
     if log_step:
-        log_step(message)
+        log_step(text)
     elif debug_steps is not None:
-        debug_steps.append(message)
-
-
-def _json_candidates(raw: str) -> List[str]:
-    """Yield plausible JSON substrings from a potentially messy LLM response."""
-    if not raw:
-        return []
-    candidates: List[str] = []
-    for match in _JSON_CODE_FENCE_RE.findall(raw):
-        cleaned = match.strip()
-        if cleaned:
-            candidates.append(cleaned)
+        debug_steps.append(text)
 
-    stripped = raw.strip()
-    if stripped:
-        candidates.append(stripped)
 
-    return candidates
+def _snippet(text: str, limit: int) -> str:
+    """Truncate ``text`` to ``limit`` characters for debug output."""
+    return text if len(text) <= limit else text[: limit - 3] + "..."
 
 
-def _parse_json_response(raw: str) -> Optional[Any]:
-    """Attempt to parse JSON content from LLM output that may include extra text."""
-    if not raw:
-        return None
-
-    decoder = json.JSONDecoder()
-    for candidate in _json_candidates(raw):
-        # Try the entire candidate first.
-        try:
-            return decoder.raw_decode(candidate)[0]
-        except json.JSONDecodeError:
-            pass
-
-        # Look for the first JSON object/array within the candidate.
-        for idx, ch in enumerate(candidate):
-            if ch in "{[":
-                try:
-                    return decoder.raw_decode(candidate[idx:])[0]
-                except json.JSONDecodeError:
-                    continue
+def query_openai(
+    prompt: str,
+    *,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    max_output_tokens: Optional[int] = None,
+    stop_on: Optional[Callable[[str], bool]] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Send a prompt to the configured OpenAI model and return the raw response text.
 
-    return None
+    When ``stop_on`` is supplied the response is streamed and generation is
+    abandoned as soon as the predicate accepts the accumulated text.
+    ``response_format`` is forwarded as ``text.format`` to constrain output to JSON.
+    """
+    text, _finished = _query_openai(
+        prompt,
+        model=model,
+        temperature=temperature,
+        max_output_tokens=max_output_tokens,
+        stop_on=stop_on,
+        response_format=response_format,
+    )
+    return text
 
 
-def query_openai(
+def _query_openai(
     prompt: str,
     *,
     model: Optional[str] = None,
     temperature: Optional[float] = None,
     max_output_tokens: Optional[int] = None,
-) -> str:
-    """Send a prompt to the configured OpenAI model and return the raw response text."""
+    stop_on: Optional[Callable[[str], bool]] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> Tuple[str, bool]:
+    """Return the response text and whether it finished.
+
+    Failed calls and streams cut off before they finished report ``False``; their
+    text, if any, is partial.
+    """
     client = _get_openai_client()
     if client is None:
-        return ""
+        return "", False
 
-    resolved_model = model or _get_setting("RECOMMENDER_OPENAI_MODEL", "gpt-4o-mini")
-    resolved_temperature = (
-        temperature
-        if temperature is not None
-        else _get_setting("RECOMMENDER_OPENAI_TEMPERATURE", 0.7)
-    )
+    config = _config_snapshot()
+    resolved_model = model or config.openai_model
+    resolved_temperature = temperature if temperature is not None else config.openai_temperature
     resolved_max_tokens = (
-        max_output_tokens
-        if max_output_tokens is not None
-        else _get_setting("RECOMMENDER_OPENAI_MAX_TOKENS", 512)
+        max_output_tokens if max_output_tokens is not None else config.openai_max_tokens
     )
 
     request_kwargs: Dict[str, object] = {
@@ -253,17 +438,22 @@ def query_openai(
         except (TypeError, ValueError):
             request_kwargs["max_output_tokens"] = 512
 
-    try:
-        response = client.responses.create(**request_kwargs)
-    except (OpenAIError, ValueError, TypeError) as exc:  # pragma: no cover - defensive logging
-        logger.error("OpenAI request failed: %s", exc)
-        return ""
+    if response_format is not None:
+        request_kwargs["text"] = {"format": response_format}
+
+    if stop_on is not None:
+        return _stream_openai_text(client, request_kwargs, stop_on, config.request_timeouts)
+
+    # A full generation sends nothing until it is done, so it only gets the longer budget.
+    response = _create_response(client, request_kwargs, config.request_timeouts[-1:])
+    if response is None:
+        return "", False
 
     _capture_openai_usage(response)
 
     output_text = getattr(response, "output_text", "")
     if output_text:
-        return output_text.strip()
+        return output_text.strip(), True
 
     # Fallback parsing for unexpected response structures.
     try:
@@ -274,63 +464,47 @@ def query_openai(
                 value = getattr(text_value, "value", None)
                 if value:
                     segments.append(str(value))
-        return "".join(segments).strip()
+        text = "".join(segments).strip()
+        return text, bool(text)
     except (AttributeError, TypeError):  # pragma: no cover - fallback only
-        return ""
-
-
-def _capture_openai_usage(response: object) -> None:
-    """Best-effort extraction of token usage metadata from OpenAI responses."""
-    usage_obj = getattr(response, "usage", None)
-    if usage_obj is None and isinstance(response, dict):
-        usage_obj = response.get("usage")
-
-    if usage_obj is None:
-        for item in getattr(response, "output", []) or []:
-            candidate = getattr(item, "usage", None)
-            if candidate is None and isinstance(item, dict):
-                candidate = item.get("usage")
-            if candidate is not None:
-                usage_obj = candidate
-                break
-
-    if usage_obj is None:
-        return
+        return "", False
 
-    prompt_tokens = _extract_usage_value(usage_obj, "prompt_tokens", "input_tokens")
-    completion_tokens = _extract_usage_value(usage_obj, "completion_tokens", "output_tokens")
-    total_tokens = _extract_usage_value(usage_obj, "total_tokens")
-    if total_tokens is None and (prompt_tokens is not None or completion_tokens is not None):
-        total_tokens = (prompt_tokens or 0) + (completion_tokens or 0)
 
-    _record_llm_usage(
-        prompt_tokens=prompt_tokens,
-        completion_tokens=completion_tokens,
-        total_tokens=total_tokens,
+def _dispatch_cache_key(
+    prompt: str,
+    model: Optional[str],
+    temperature: Optional[float],
+    max_output_tokens: Optional[int],
+    stop_on: Optional[Callable[[str], bool]],
+    response_format: Optional[Dict[str, Any]] = None,
+    stop_label: str = "",
+) -> str:
+    """Return a stable digest identifying an LLM request and its options.
+
+    ``stop_label`` names the stop predicate; plain functions fall back to their
+    qualified name.
+    """
+    if stop_on and not stop_label:
+        stop_label = getattr(stop_on, "__qualname__", "")
+    raw = json.dumps(
+        [prompt, model, temperature, max_output_tokens, stop_label, response_format],
+        ensure_ascii=False,
+        sort_keys=True,
     )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
 
 
-def _extract_usage_value(source: object, *keys: str) -> Optional[int]:
-    for key in keys:
-        value = None
-        if isinstance(source, dict):
-            value = source.get(key)
-        if value is None:
-            try:
-                value = getattr(source, key)
-            except AttributeError:
-                value = None
-        if value is None and hasattr(source, "get"):
-            try:
-                value = source.get(key)
-            except (AttributeError, TypeError):  # pragma: no cover - defensive fallback
-                value = None
-        if value is not None:
-            try:
-                return int(value)
-            except (TypeError, ValueError):
-                continue
-    return None
+def _response_cache() -> Optional[Any]:
+    """Return the lookup cache (or the default cache) when usable for LLM responses."""
+    if django_caches is None or DJANGO_SETTINGS is None or not DJANGO_SETTINGS.configured:
+        return None
+    if _config_snapshot().response_cache_seconds <= 0:
+        return None
+    alias = _get_setting("RECOMMENDER_LOOKUP_CACHE_ALIAS", "default")
+    try:
+        return django_caches[alias]
+    except InvalidCacheBackendError:
+        return django_caches["default"]
 
 
 def dispatch_llm_query(
@@ -339,17 +513,96 @@ def dispatch_llm_query(
     provider: Optional[str] = None,
     **kwargs: object,
 ) -> str:
-    """Route LLM prompts to OpenAI (provider retained for backward compatibility)."""
+    """Route LLM prompts to OpenAI (provider retained for backward compatibility).
+
+    ``stop_label`` identifies a ``stop_on`` predicate (such as a ``functools.partial``)
+    in the cache key. Finished responses are cached by request digest for
+    ``RECOMMENDER_LLM_CACHE_SECONDS``, and concurrent callers issuing an identical
+    request wait on the first caller's in-flight query instead of sending a
+    duplicate API call. Failed or cut-off responses are neither cached nor shared;
+    waiters query on their own instead.
+    """
     _ = provider  # provider toggles are deprecated; OpenAI is always used.
     model = kwargs.get("model")
     temperature = kwargs.get("temperature")
     max_tokens = kwargs.get("max_output_tokens")
-    return query_openai(
+    stop_on = kwargs.get("stop_on")
+    response_format = kwargs.get("response_format")
+    query_kwargs = {
+        "model": model if isinstance(model, str) else None,
+        "temperature": temperature if isinstance(temperature, (int, float)) else None,
+        "max_output_tokens": max_tokens if isinstance(max_tokens, int) else None,
+        "stop_on": stop_on if callable(stop_on) else None,
+        "response_format": response_format if isinstance(response_format, dict) else None,
+    }
+    stop_label = kwargs.get("stop_label")
+    key = _dispatch_cache_key(
         prompt,
-        model=model if isinstance(model, str) else None,
-        temperature=temperature if isinstance(temperature, (int, float)) else None,
-        max_output_tokens=max_tokens if isinstance(max_tokens, int) else None,
+        stop_label=stop_label if isinstance(stop_label, str) else "",
+        **query_kwargs,
     )
+    response_cache = _response_cache()
+    cache_key = f"llm:response:{key}"
+    if response_cache is not None:
+        cached = response_cache.get(cache_key)
+        if isinstance(cached, str) and cached:
+            return cached
+
+    with _INFLIGHT_LOCK:
+        pending = _INFLIGHT.get(key)
+        if pending is None:
+            future: "Future[Optional[str]]" = Future()
+            _INFLIGHT[key] = future
+    if pending is not None:
+        try:
+            shared = pending.result(timeout=_INFLIGHT_WAIT_SECONDS)
+        except FutureTimeoutError:
+            logger.warning("Timed out waiting on a coalesced LLM request; querying directly.")
+            shared = None
+        if shared is not None:
+            return shared
+        text, _finished = _query_openai(prompt, **query_kwargs)
+        return text
+
+    # The leader queries on its own thread so token usage lands in its tracker.
+    try:
+        result, finished = _query_openai(prompt, **query_kwargs)
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    else:
+        future.set_result(result if finished else None)
+        if response_cache is not None and finished and result:
+            response_cache.set(
+                cache_key, result, timeout=_config_snapshot().response_cache_seconds
+            )
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(key, None)
+    return result
+
+
+def _keyword_attributes(prompt: str) -> Optional[Dict[str, object]]:
+    """Return attributes for plain "mood + genre" prompts, or None to ask the LLM."""
+    lowered = (prompt or "").lower()
+    genres = _SHORTCUT_GENRE_RE.findall(lowered)
+    moods = _SHORTCUT_MOOD_RE.findall(lowered)
+    energies = _SHORTCUT_ENERGY_RE.findall(lowered)
+    if len(genres) != 1 or len(moods) != 1 or len(energies) > 1:
+        return None
+    remainder = _SHORTCUT_ENERGY_RE.sub(" ", lowered)
+    remainder = _SHORTCUT_MOOD_RE.sub(" ", _SHORTCUT_GENRE_RE.sub(" ", remainder))
+    if any(word not in _SHORTCUT_FILLER for word in _SHORTCUT_WORD_RE.findall(remainder)):
+        # Anything else (artists, eras, activities) needs the model to interpret it.
+        return None
+    mood = moods[0]
+    return {
+        "mood": mood,
+        "genre": _fold_genre_label(genres[0]),
+        "energy": energies[0] if energies else _SHORTCUT_MOOD_ENERGY.get(mood, "medium"),
+        "artist": "",
+        "artists": [],
+    }
 
 
 def extract_playlist_attributes(
@@ -359,27 +612,69 @@ def extract_playlist_attributes(
     provider: Optional[str] = None,
 ) -> Dict[str, object]:
     """Pull mood, genre, and energy descriptors from a free-form user prompt."""
-    query = (
-        "Extract the mood, genre, energy level, and any explicitly referenced primary artists "
-        "or bands from this user playlist request. Respond with JSON containing the keys "
-        "`mood`, `genre`, and `energy`, plus optional `artist` (string) and `artists` "
-        "(array of strings) when specific performers are mentioned. "
-        "If no artist is present, set those fields to null or an empty list. "
-        f"Request: {prompt}"
+    attributes, _ = _extract_attributes(prompt, debug_steps, log_step, provider, seed_count=0)
+    return attributes
+
+
+def plan_playlist(
+    prompt: str,
+    seed_count: int,
+    debug_steps: Optional[List[str]] = None,
+    log_step: Optional[Callable[[str], None]] = None,
+    provider: Optional[str] = None,
+) -> Tuple[Dict[str, object], List[Tuple[str, str]]]:
+    """Extract attributes and up to ``seed_count`` seed tracks in one LLM round-trip.
+
+    The returned ``(title, artist)`` pairs can be handed to :func:`suggest_seed_tracks`
+    as ``prefetched`` so it skips its own query; they are empty when the plan response
+    carried no seeds.
+    """
+    return _extract_attributes(prompt, debug_steps, log_step, provider, seed_count=seed_count)
+
+
+def _extract_attributes(
+    prompt: str,
+    debug_steps: Optional[List[str]],
+    log_step: Optional[Callable[[str], None]],
+    provider: Optional[str],
+    *,
+    seed_count: int,
+) -> Tuple[Dict[str, object], List[Tuple[str, str]]]:
+    """Shared body of :func:`extract_playlist_attributes` and :func:`plan_playlist`."""
+    shortcut = _keyword_attributes(prompt)
+    if shortcut is not None:
+        _log(debug_steps, log_step, lambda: f"Keyword shortcut attributes: {shortcut}")
+        return shortcut, []
+
+    if seed_count > 0:
+        query = "".join((_PLAN_PROMPT_PREFIX, str(int(seed_count)), _PLAN_PROMPT_SUFFIX, prompt))
+        model = None
+    else:
+        # Filling three JSON fields does not need the creative model.
+        query = _ATTRIBUTE_PROMPT_PREFIX + prompt
+        model = _config_snapshot().attribute_model
+    _log(debug_steps, log_step, lambda: f"LLM prompt (attribute extraction): {query}")
+    response = dispatch_llm_query(
+        query, provider=provider, model=model, response_format=_JSON_OBJECT_FORMAT
+    )
+    _log(
+        debug_steps,
+        log_step,
+        lambda: f"LLM raw response (attributes): {_snippet(response, 300)}",
     )
-    _log(debug_steps, log_step, f"LLM prompt (attribute extraction): {query}")
-    response = dispatch_llm_query(query, provider=provider)
-    snippet = response if len(response) <= 300 else response[:297] + "..."
-    _log(debug_steps, log_step, f"LLM raw response (attributes): {snippet}")
     if not response:
         _log(
             debug_steps,
             log_step,
             "LLM attribute extraction failed; using default attributes.",
         )
-        return DEFAULT_ATTRIBUTES.copy()
+        return DEFAULT_ATTRIBUTES.copy(), []
 
     parsed = _parse_json_response(response)
+    seed_payload = None
+    if seed_count > 0 and isinstance(parsed, dict) and isinstance(parsed.get("attributes"), dict):
+        seed_payload = parsed.get("seeds")
+        parsed = parsed["attributes"]
     if isinstance(parsed, dict):
         lowered = {str(key).lower(): value for key, value in parsed.items()}
         attributes = {
@@ -416,89 +711,92 @@ def extract_playlist_attributes(
         attributes = {key: (value or DEFAULT_ATTRIBUTES[key]) for key, value in attributes.items()}
         attributes["artist"] = artist_hint
         attributes["artists"] = artists_list
-        _log(debug_steps, log_step, f"LLM parsed attributes: {attributes}")
-        return attributes
+        _log(debug_steps, log_step, lambda: f"LLM parsed attributes: {attributes}")
+        seeds = list(_coerce_track_list(seed_payload, "")) if seed_payload else []
+        return attributes, seeds
 
     _log(
         debug_steps,
         log_step,
-        f"Failed to parse LLM attribute response; using defaults. Response snippet: {snippet}",
+        lambda: (
+            "Failed to parse LLM attribute response; using defaults. "
+            f"Response snippet: {_snippet(response, 300)}"
+        ),
     )
-    fallback = DEFAULT_ATTRIBUTES.copy()
-    fallback.setdefault("artist", "")
-    fallback.setdefault("artists", [])
-    return fallback
+    return {**DEFAULT_ATTRIBUTES, "artist": "", "artists": []}, []
 
 
 def suggest_seed_tracks(
     prompt: str,
-    attributes: Dict[str, str],
+    attributes: Dict[str, object],
     debug_steps: Optional[List[str]] = None,
     log_step: Optional[Callable[[str], None]] = None,
     max_suggestions: int = 5,
     provider: Optional[str] = None,
+    prefetched: Optional[Sequence[Tuple[str, str]]] = None,
 ) -> List[Dict[str, str]]:
-    """Use the LLM to propose seed tracks as title/artist pairs."""
+    """Use the LLM to propose seed tracks as title/artist pairs.
+
+    Non-empty ``prefetched`` pairs (from :func:`plan_playlist`) are used instead of
+    issuing a separate seed query.
+    """
     suggestion_cap = max(1, int(max_suggestions or 5))
-    query = (
-        "You are selecting seed songs for a Spotify playlist.\n"
-        f"Playlist request: \"{prompt}\"\n"
-        f"Extracted attributes: {attributes}\n"
-        f"Return a JSON array with at most {suggestion_cap} objects, each containing the keys "
-        "\"title\" and \"artist\". Choose well-known songs that fit the mood/genre/"
-        "energy and are likely available on Spotify."
-    )
-    _log(debug_steps, log_step, f"LLM prompt (seed suggestions): {query}")
-    response = dispatch_llm_query(query, provider=provider)
-    snippet = response if len(response) <= 400 else response[:397] + "..."
-    _log(debug_steps, log_step, f"LLM raw response (seed suggestions): {snippet}")
     suggestions: List[Dict[str, str]] = []
+    seen_pairs: Dict[Tuple[str, str], None] = {}
 
     def _add_suggestion(title: str, artist: str):
         title = (title or "").strip()
-        artist = (artist or "").strip()
         if not title:
             return
+        artist = (artist or "").strip()
+        key = (title.lower(), artist.lower())
+        if key in seen_pairs:
+            return
+        seen_pairs[key] = None
         suggestions.append({"title": title, "artist": artist})
 
-    if response:
-        parsed = _parse_json_response(response)
-        if isinstance(parsed, dict):
-            if "tracks" in parsed:
-                parsed = parsed["tracks"]
-            elif "playlist" in parsed:
-                parsed = parsed["playlist"]
-            elif "songs" in parsed:
-                parsed = parsed["songs"]
-        if isinstance(parsed, list):
-            for item in parsed:
-                if isinstance(item, dict):
-                    title = item.get("title") or item.get("song") or item.get("name")
-                    artist = item.get("artist") or item.get("artists") or item.get("singer")
-                    if isinstance(artist, list):
-                        artist = ", ".join(str(part) for part in artist)
-                    if title:
-                        _add_suggestion(str(title), str(artist or ""))
-                elif isinstance(item, str):
-                    if " - " in item:
-                        title, artist = item.split(" - ", 1)
-                    else:
-                        title, artist = item, ""
-                    _add_suggestion(title, artist)
-        else:
-            lines = [line.strip() for line in response.splitlines() if line.strip()]
-            for line in lines:
-                if " - " in line:
-                    title, artist = line.split(" - ", 1)
-                else:
-                    continue
-                _add_suggestion(title, artist)
+    if prefetched:
+        _log(debug_steps, log_step, "Using seed suggestions from the attribute extraction call.")
+        candidates: Iterator[Tuple[str, str]] = iter(prefetched)
+    else:
+        query = "".join(
+            (
+                _SEED_PROMPT_PREFIX,
+                prompt,
+                _SEED_PROMPT_ATTRIBUTES,
+                str(attributes),
+                _SEED_PROMPT_COUNT,
+                str(suggestion_cap),
+                _SEED_PROMPT_SUFFIX,
+            )
+        )
+        _log(debug_steps, log_step, lambda: f"LLM prompt (seed suggestions): {query}")
+        response = dispatch_llm_query(
+            query,
+            provider=provider,
+            stop_on=functools.partial(_track_array_limit_reached, suggestion_cap),
+            stop_label=f"track-array-limit:{suggestion_cap}",
+            response_format=_SEED_TRACKS_FORMAT,
+        )
+        _log(
+            debug_steps,
+            log_step,
+            lambda: f"LLM raw response (seed suggestions): {_snippet(response, 400)}",
+        )
+        candidates = (
+            _coerce_track_list(_parse_json_response(response), response) if response else iter(())
+        )
+
+    for title, artist in candidates:
+        _add_suggestion(title, artist)
+        if len(suggestions) >= suggestion_cap:
+            break
 
     if suggestions:
         _log(
             debug_steps,
             log_step,
-            f"LLM parsed seed suggestions: {suggestions[:max_suggestions]}",
+            lambda: f"LLM parsed seed suggestions: {suggestions[:max_suggestions]}",
         )
     else:
         _log(
@@ -506,14 +804,13 @@ def suggest_seed_tracks(
             log_step,
             "LLM seed suggestions unavailable; will rely on Spotify fallback.",
         )
-        genre_key = (attributes.get("genre") or "").lower()
-        canonical = genre_key.replace("-", " ").strip()
-        fallbacks = _GENRE_FALLBACKS.get(canonical) or _DEFAULT_FALLBACKS
-        suggestions = fallbacks[:max_suggestions]
+        canonical = _fold_genre_label(attributes.get("genre") or "")
+        fallbacks = _GENRE_FALLBACKS_NORMALIZED.get(canonical, _DEFAULT_FALLBACKS)
+        suggestions = [dict(track) for track in fallbacks[:suggestion_cap]]
         _log(
             debug_steps,
             log_step,
-            f"Provided fallback seed suggestions for genre '{canonical or 'default'}'.",
+            lambda: f"Provided fallback seed suggestions for genre '{canonical or 'default'}'.",
         )
 
     return suggestions[:suggestion_cap]
@@ -521,7 +818,7 @@ def suggest_seed_tracks(
 
 def suggest_remix_tracks(
     existing_tracks: List[str],
-    attributes: Dict[str, str],
+    attributes: Dict[str, object],
     *,
     prompt: str,
     target_count: int,
@@ -534,17 +831,13 @@ def suggest_remix_tracks(
     if desired_count <= 0:
         return []
 
-    unique_existing: List[str] = []
-    seen_existing: Set[str] = set()
+    # Dicts keep insertion order, so setdefault dedupes case-insensitively in one pass.
+    existing_by_key: Dict[str, str] = {}
     for track in existing_tracks:
         normalized = (track or "").strip()
-        if not normalized:
-            continue
-        lowered = normalized.lower()
-        if lowered in seen_existing:
-            continue
-        seen_existing.add(lowered)
-        unique_existing.append(normalized)
+        if normalized:
+            existing_by_key.setdefault(normalized.lower(), normalized)
+    unique_existing = list(existing_by_key.values())
     snapshot_limit = max(1, min(desired_count, 25))
     track_snapshot = unique_existing[:snapshot_limit]
     if not track_snapshot:
@@ -555,70 +848,47 @@ def suggest_remix_tracks(
     )
     attribute_label = json.dumps(attributes, ensure_ascii=False)
     prompt_label = prompt or "Unnamed playlist request"
-    query = (
-        "You are refreshing an existing Spotify playlist for a user.\n"
-        f"Original request: \"{prompt_label}\"\n"
-        f"Target attributes: {attribute_label}\n"
-        "Current playlist tracks:\n"
-        f"{numbered_tracks}\n\n"
-        "Remix the playlist by returning exactly "
-        f"{desired_count} songs that match the same mood, genre, and energy. "
-        "You may keep some of the existing songs, but avoid duplicates overall "
-        "and ensure the list feels refreshed. Return a JSON array where each "
-        "object contains the keys \"title\" and \"artist\". Prefer well-known "
-        "tracks that are likely available on Spotify US."
+    query = "".join(
+        (
+            _REMIX_PROMPT_PREFIX,
+            prompt_label,
+            _REMIX_PROMPT_ATTRIBUTES,
+            attribute_label,
+            _REMIX_PROMPT_TRACKS,
+            numbered_tracks,
+            _REMIX_PROMPT_COUNT,
+            str(desired_count),
+            _REMIX_PROMPT_SUFFIX,
+        )
+    )
+    _log(debug_steps, log_step, lambda: f"LLM prompt (remix suggestions): {query}")
+    response = dispatch_llm_query(query, provider=provider, stop_on=_json_array_closed)
+    _log(
+        debug_steps,
+        log_step,
+        lambda: f"LLM raw response (remix suggestions): {_snippet(response, 400)}",
     )
-    _log(debug_steps, log_step, f"LLM prompt (remix suggestions): {query}")
-    response = dispatch_llm_query(query, provider=provider)
-    snippet = response if len(response) <= 400 else response[:397] + "..."
-    _log(debug_steps, log_step, f"LLM raw response (remix suggestions): {snippet}")
 
     suggestions: List[Dict[str, str]] = []
-    seen_pairs: Set[tuple[str, str]] = set()
+    seen_pairs: Dict[Tuple[str, str], None] = {}
 
     def _add_suggestion(title: str, artist: str):
         title = (title or "").strip()
-        artist = (artist or "").strip()
         if not title:
             return
+        artist = (artist or "").strip()
         key = (title.lower(), artist.lower())
         if key in seen_pairs:
             return
-        seen_pairs.add(key)
+        seen_pairs[key] = None
         suggestions.append({"title": title, "artist": artist})
 
     if response:
         parsed = _parse_json_response(response)
-        if isinstance(parsed, dict):
-            if "tracks" in parsed:
-                parsed = parsed["tracks"]
-            elif "playlist" in parsed:
-                parsed = parsed["playlist"]
-            elif "songs" in parsed:
-                parsed = parsed["songs"]
-        if isinstance(parsed, list):
-            for item in parsed:
-                if isinstance(item, dict):
-                    title = item.get("title") or item.get("song") or item.get("name")
-                    artist = item.get("artist") or item.get("artists") or item.get("singer")
-                    if isinstance(artist, list):
-                        artist = ", ".join(str(part) for part in artist)
-                    if title:
-                        _add_suggestion(str(title), str(artist or ""))
-                elif isinstance(item, str):
-                    if " - " in item:
-                        title, artist = item.split(" - ", 1)
-                    else:
-                        title, artist = item, ""
-                    _add_suggestion(title, artist)
-        else:
-            lines = [line.strip() for line in response.splitlines() if line.strip()]
-            for line in lines:
-                if " - " in line:
-                    title, artist = line.split(" - ", 1)
-                else:
-                    title, artist = line, ""
-                _add_suggestion(title, artist)
+        for title, artist in _coerce_track_list(parsed, response, keep_bare_lines=True):
+            _add_suggestion(title, artist)
+            if len(suggestions) >= desired_count:
+                break
 
     if len(suggestions) < desired_count:
         _log(
@@ -627,10 +897,7 @@ def suggest_remix_tracks(
             "LLM remix suggestions insufficient; filling with existing playlist tracks.",
         )
         for track in unique_existing:
-            if " - " in track:
-                title, artist = track.split(" - ", 1)
-            else:
-                title, artist = track, ""
+            title, _, artist = track.partition(_DASH_SPLIT)
             _add_suggestion(title, artist)
             if len(suggestions) >= desired_count:
                 break
@@ -644,14 +911,14 @@ def suggest_remix_tracks(
 
     if suggestions:
         preview = suggestions[: min(5, len(suggestions))]
-        _log(debug_steps, log_step, f"LLM parsed remix suggestions: {preview}")
+        _log(debug_steps, log_step, lambda: f"LLM parsed remix suggestions: {preview}")
 
     return suggestions[:desired_count]
 
 
 def refine_playlist(
     seed_tracks: List[str],
-    attributes: Dict[str, str],
+    attributes: Dict[str, object],
     debug_steps: Optional[List[str]] = None,
     log_step: Optional[Callable[[str], None]] = None,
     query_fn: Optional[Callable[[str], str]] = None,
@@ -659,16 +926,23 @@ def refine_playlist(
 ) -> List[str]:
     """Ask the LLM for additional tracks based on the current seed list and attributes."""
     track_list = "\n".join(seed_tracks)
-    query = (
-        f"Given these seed tracks: {track_list}, and attributes {attributes}, "
-        "recommend 5 additional widely known songs that are available on Spotify US. "
-        "Return each song on a new line and prefer artists that match the requested genre."
+    query = "".join(
+        (
+            _REFINE_PROMPT_PREFIX,
+            track_list,
+            _REFINE_PROMPT_ATTRIBUTES,
+            str(attributes),
+            _REFINE_PROMPT_SUFFIX,
+        )
     )
-    _log(debug_steps, log_step, f"LLM prompt (playlist refinement): {query}")
+    _log(debug_steps, log_step, lambda: f"LLM prompt (playlist refinement): {query}")
     llm_query_fn = query_fn or (lambda text: dispatch_llm_query(text, provider=provider))
     response = llm_query_fn(query)
-    snippet = response if len(response) <= 400 else response[:397] + "..."
-    _log(debug_steps, log_step, f"LLM raw response (refinement): {snippet}")
+    _log(
+        debug_steps,
+        log_step,
+        lambda: f"LLM raw response (refinement): {_snippet(response, 400)}",
+    )
     if not response:
         _log(
             debug_steps,
@@ -677,10 +951,13 @@ def refine_playlist(
         )
         return seed_tracks
 
-    additions = [
-        line.strip()
-        for line in response.splitlines()
-        if line.strip() and line.strip() not in seed_tracks
-    ]
-    _log(debug_steps, log_step, f"LLM suggested additions: {additions}")
+    seen = {track.strip().casefold() for track in seed_tracks}
+    additions: List[str] = []
+    for line in response.splitlines():
+        candidate = line.strip()
+        folded = candidate.casefold()
+        if candidate and folded not in seen:
+            seen.add(folded)
+            additions.append(candidate)
+    _log(debug_steps, log_step, lambda: f"LLM suggested additions: {additions}")
     return seed_tracks + additions
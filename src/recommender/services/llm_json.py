@@ -0,0 +1,209 @@
+"""Helpers for pulling JSON and track lists out of free-form LLM output."""
+
+import json
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_DASH_SPLIT = " - "
+_TRACK_LIST_KEYS = ("tracks", "playlist", "songs")
+_TITLE_KEYS = ("title", "song", "name")
+_ARTIST_KEYS = ("artist", "artists", "singer")
+_JSON_CODE_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.IGNORECASE | re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",(\s*[}\]])")
+
+
+def _json_candidates(raw: str) -> List[str]:
+    """Yield plausible JSON substrings from a potentially messy LLM response."""
+    if not raw:
+        return []
+    candidates: List[str] = []
+    for match in _JSON_CODE_FENCE_RE.findall(raw):
+        cleaned = match.strip()
+        if cleaned:
+            candidates.append(cleaned)
+
+    stripped = raw.strip()
+    if stripped:
+        candidates.append(stripped)
+
+    return candidates
+
+
+def _closed_truncated_array(candidate: str, start: int) -> Optional[Any]:
+    """Decode the JSON array opened at ``start`` up to its last complete entry.
+
+    Arrays truncated by an early stream stop or the token cap keep their complete
+    entries instead of collapsing to whatever nested object parses first.
+    """
+    _, last_end = _completed_array_items(candidate, start)
+    if last_end < 0:
+        return None
+    try:
+        return json.loads(candidate[start : last_end + 1] + "]")
+    except json.JSONDecodeError:
+        return None
+
+
+def _parse_json_response(raw: str) -> Optional[Any]:
+    """Attempt to parse JSON content from LLM output that may include extra text."""
+    if not raw:
+        return None
+
+    decoder = json.JSONDecoder()
+    candidates = _json_candidates(raw)
+    for candidate in candidates:
+        # Try the entire candidate first.
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            pass
+
+        # Look for the first JSON object/array within the candidate.
+        for idx, ch in enumerate(candidate):
+            if ch not in "{[":
+                continue
+            try:
+                return decoder.raw_decode(candidate, idx)[0]
+            except json.JSONDecodeError:
+                pass
+            if ch == "[":
+                truncated = _closed_truncated_array(candidate, idx)
+                if truncated is not None:
+                    return truncated
+
+    # Models often emit almost-JSON; retry the first value without trailing commas
+    # before callers drop to line splitting and lose the structured artist field.
+    for candidate in candidates:
+        relaxed = _TRAILING_COMMA_RE.sub(r"\1", candidate)
+        start = next((idx for idx, ch in enumerate(relaxed) if ch in "{["), -1)
+        if start < 0:
+            continue
+        try:
+            return decoder.raw_decode(relaxed, start)[0]
+        except json.JSONDecodeError:
+            continue
+
+    return None
+
+
+def _first_present(item: Dict[str, Any], keys: Tuple[str, ...]) -> Any:
+    """Return the first truthy value stored under any of the given keys."""
+    for key in keys:
+        value = item.get(key)
+        if value:
+            return value
+    return None
+
+
+def _coerce_track_list(
+    parsed: Any,
+    raw_response: str,
+    *,
+    keep_bare_lines: bool = False,
+) -> Iterator[Tuple[str, str]]:
+    """Yield title/artist pairs from parsed LLM output (or its raw text).
+
+    When ``parsed`` is not a list the raw response is scanned line by line for
+    ``"Title - Artist"`` entries; ``keep_bare_lines`` also keeps lines without
+    an artist separator. Pairs are produced lazily so callers can stop once
+    they have collected enough suggestions.
+    """
+    if isinstance(parsed, dict):
+        for key in _TRACK_LIST_KEYS:
+            if key in parsed:
+                parsed = parsed[key]
+                break
+
+    if isinstance(parsed, list):
+        for item in parsed:
+            if isinstance(item, dict):
+                title = _first_present(item, _TITLE_KEYS)
+                artist = _first_present(item, _ARTIST_KEYS)
+                if isinstance(artist, (list, tuple)):
+                    artist = (
+                        ", ".join(artist)
+                        if all(isinstance(part, str) for part in artist)
+                        else ", ".join(map(str, artist))
+                    )
+                if title:
+                    yield str(title), str(artist or "")
+            elif isinstance(item, str):
+                title, _, artist = item.partition(_DASH_SPLIT)
+                yield title, artist
+        return
+
+    for raw_line in (raw_response or "").splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        title, separator, artist = line.partition(_DASH_SPLIT)
+        if separator or keep_bare_lines:
+            yield title, artist
+
+
+def _json_array_closed(text: str) -> bool:
+    """Return True once ``text`` holds a complete JSON array of track entries."""
+    if not text.rstrip().endswith("]"):
+        return False
+    start = text.find("[")
+    if start < 0:
+        return False
+    try:
+        parsed = json.JSONDecoder().raw_decode(text, start)[0]
+    except json.JSONDecodeError:
+        return False
+    if not isinstance(parsed, list):
+        return False
+    return bool(parsed) and all(isinstance(item, (dict, str)) for item in parsed)
+
+
+def _completed_array_items(text: str, start: int) -> Tuple[int, int]:
+    """Count entries fully closed inside the JSON array opened at ``start``.
+
+    Returns ``(count, end)`` where ``end`` indexes the last character of the final
+    complete entry, or -1 when none has closed yet.
+    """
+    count = 0
+    last_end = -1
+    depth = 0
+    in_string = False
+    escaped = False
+    for idx in range(start, len(text)):
+        ch = text[idx]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+                if depth == 1:
+                    count += 1
+                    last_end = idx
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 1:
+                count += 1
+                last_end = idx
+            elif depth <= 0:
+                break
+    return count, last_end
+
+
+def _track_array_limit_reached(limit: int, text: str) -> bool:
+    """Stream stop predicate that fires once ``limit`` entries have fully arrived.
+
+    Bind ``limit`` with :func:`functools.partial` and pass a matching ``stop_label``
+    to :func:`dispatch_llm_query` so different caps never share a cached response.
+    """
+    if _json_array_closed(text):
+        return True
+    # Only re-scan when a delta has just closed an object entry.
+    if not text.rstrip().endswith("}"):
+        return False
+    start = text.find("[")
+    return start >= 0 and _completed_array_items(text, start)[0] >= limit
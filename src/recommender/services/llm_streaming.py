@@ -0,0 +1,292 @@
+"""Streaming and token accounting helpers for OpenAI Responses API calls."""
+
+import logging
+import time
+from threading import local
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Optional, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover - the SDK is imported on first client use
+    from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+_THREAD_STATE = local()
+# Rough English average, used only when a stream stops before reporting usage.
+_CHARS_PER_TOKEN = 4
+# Events that end a streamed response; a stream that stops before one was cut off.
+_TERMINAL_EVENTS = frozenset({"response.completed", "response.incomplete"})
+
+
+def _default_usage_bucket() -> Dict[str, int]:
+    return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+
+def reset_llm_usage_tracker() -> None:
+    """Reset the accumulated token counters for the current thread."""
+    _THREAD_STATE.llm_usage = _default_usage_bucket()
+
+
+def _usage_bucket() -> Dict[str, int]:
+    usage = getattr(_THREAD_STATE, "llm_usage", None)
+    if usage is None:
+        usage = _default_usage_bucket()
+        _THREAD_STATE.llm_usage = usage
+    return usage
+
+
+def _record_llm_usage(
+    *,
+    prompt_tokens: Optional[int] = None,
+    completion_tokens: Optional[int] = None,
+    total_tokens: Optional[int] = None,
+) -> None:
+    usage = _usage_bucket()
+    if prompt_tokens:
+        usage["prompt_tokens"] += max(int(prompt_tokens), 0)
+    if completion_tokens:
+        usage["completion_tokens"] += max(int(completion_tokens), 0)
+    if total_tokens:
+        usage["total_tokens"] += max(int(total_tokens), 0)
+
+
+def get_llm_usage_snapshot() -> Dict[str, int]:
+    """Return the current token counters for the active thread."""
+    usage = getattr(_THREAD_STATE, "llm_usage", None)
+    if not usage:
+        return _default_usage_bucket()
+    return {
+        "prompt_tokens": int(usage.get("prompt_tokens", 0)),
+        "completion_tokens": int(usage.get("completion_tokens", 0)),
+        "total_tokens": int(usage.get("total_tokens", 0)),
+    }
+
+
+def _capture_openai_usage(response: object) -> None:
+    """Best-effort extraction of token usage metadata from OpenAI responses."""
+    usage_obj = getattr(response, "usage", None)
+    if usage_obj is None and isinstance(response, dict):
+        usage_obj = response.get("usage")
+
+    if usage_obj is None:
+        for item in getattr(response, "output", []) or []:
+            candidate = getattr(item, "usage", None)
+            if candidate is None and isinstance(item, dict):
+                candidate = item.get("usage")
+            if candidate is not None:
+                usage_obj = candidate
+                break
+
+    if usage_obj is None:
+        return
+
+    prompt_tokens = _extract_usage_value(usage_obj, "prompt_tokens", "input_tokens")
+    completion_tokens = _extract_usage_value(usage_obj, "completion_tokens", "output_tokens")
+    total_tokens = _extract_usage_value(usage_obj, "total_tokens")
+    if total_tokens is None and (prompt_tokens is not None or completion_tokens is not None):
+        total_tokens = (prompt_tokens or 0) + (completion_tokens or 0)
+
+    _record_llm_usage(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=total_tokens,
+    )
+
+
+def _extract_usage_value(source: object, *keys: str) -> Optional[int]:
+    for key in keys:
+        value = None
+        if isinstance(source, dict):
+            value = source.get(key)
+        if value is None:
+            try:
+                value = getattr(source, key)
+            except AttributeError:
+                value = None
+        if value is None and hasattr(source, "get"):
+            try:
+                value = source.get(key)
+            except (AttributeError, TypeError):  # pragma: no cover - defensive fallback
+                value = None
+        if value is not None:
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                continue
+    return None
+
+
+def _openai_errors() -> Tuple[type, ...]:
+    """Return the exception types an OpenAI call (or its stream) may raise."""
+    import httpx  # pylint: disable=import-outside-toplevel
+    from openai import OpenAIError  # pylint: disable=import-outside-toplevel
+
+    return (OpenAIError, httpx.HTTPError, ValueError, TypeError)
+
+
+def _retryable_errors() -> Tuple[type, ...]:
+    """Return the failures worth another attempt with a longer budget."""
+    from openai import (  # pylint: disable=import-outside-toplevel
+        APIConnectionError,
+        InternalServerError,
+        RateLimitError,
+    )
+
+    return (APIConnectionError, InternalServerError, RateLimitError)
+
+
+def _attempt_budgets(
+    client: "OpenAI",
+    timeouts: Tuple[Optional[float], ...],
+) -> Iterator[Tuple[int, bool, "OpenAI", Optional[Any]]]:
+    """Yield ``(attempt, is_last, client, timeout)`` for each configured budget.
+
+    Earlier attempts skip the SDK's own retries so a stall moves straight on to
+    the longer budget; the last attempt keeps them.
+    """
+    import httpx  # pylint: disable=import-outside-toplevel
+
+    timeouts = timeouts or (None,)
+    for attempt, read_timeout in enumerate(timeouts, start=1):
+        is_last = attempt == len(timeouts)
+        attempt_client = client if is_last else client.with_options(max_retries=0)
+        timeout = httpx.Timeout(read_timeout, connect=2.0) if read_timeout is not None else None
+        yield attempt, is_last, attempt_client, timeout
+
+
+def _create_response(
+    client: "OpenAI",
+    request_kwargs: Dict[str, object],
+    timeouts: Tuple[Optional[float], ...],
+) -> Optional[Any]:
+    """Create a response, moving on to the next timeout when an attempt fails.
+
+    The read timeout bounds the wait for the next chunk of the response. Connection
+    failures, timeouts, rate limits and server errors fall through to the next
+    attempt; anything else gives up immediately.
+    """
+    for attempt, is_last, attempt_client, timeout in _attempt_budgets(client, timeouts):
+        attempt_kwargs = dict(request_kwargs)
+        if timeout is not None:
+            attempt_kwargs["timeout"] = timeout
+        started = time.perf_counter()
+        try:
+            response = attempt_client.responses.create(**attempt_kwargs)
+        except _retryable_errors() as exc:
+            logger.warning(
+                "OpenAI attempt %d failed after %d ms: %s",
+                attempt,
+                (time.perf_counter() - started) * 1000,
+                exc,
+            )
+            if is_last:
+                return None
+            continue
+        except _openai_errors() as exc:  # pragma: no cover - defensive logging
+            logger.error("OpenAI request failed: %s", exc)
+            return None
+        logger.debug(
+            "OpenAI attempt %d finished in %d ms.",
+            attempt,
+            (time.perf_counter() - started) * 1000,
+        )
+        return response
+    return None
+
+
+def _estimate_usage(prompt: object, output: str) -> None:
+    """Record approximate token usage for a stream that ended before reporting it."""
+    prompt_tokens = -(-len(str(prompt or "")) // _CHARS_PER_TOKEN)
+    completion_tokens = -(-len(output) // _CHARS_PER_TOKEN)
+    _record_llm_usage(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+    )
+
+
+def _read_stream(stream: Any, stop_on: Callable[[str], bool]) -> Tuple[str, bool, bool]:
+    """Consume ``stream`` and return ``(text, finished, usage_recorded)``.
+
+    A stream is finished once ``stop_on`` accepts the text or a terminal event
+    arrives; one that errors or simply ends before either is not.
+    """
+    accumulated = ""
+    finished = False
+    usage_recorded = False
+    try:
+        for event in stream:
+            event_type = getattr(event, "type", "")
+            if event_type == "response.output_text.delta":
+                accumulated += getattr(event, "delta", "") or ""
+                if stop_on(accumulated):
+                    finished = True
+                    break
+                continue
+            if event_type in _TERMINAL_EVENTS:
+                finished = True
+            # response.completed / response.incomplete carry the final usage.
+            response = getattr(event, "response", None)
+            if getattr(response, "usage", None) is not None:
+                _capture_openai_usage(response)
+                usage_recorded = True
+    except _openai_errors() as exc:
+        logger.warning("OpenAI stream interrupted: %s", exc)
+    finally:
+        if callable(getattr(stream, "close", None)):
+            stream.close()
+    return accumulated, finished, usage_recorded
+
+
+def _stream_openai_text(
+    client: "OpenAI",
+    request_kwargs: Dict[str, object],
+    stop_on: Callable[[str], bool],
+    timeouts: Tuple[Optional[float], ...],
+) -> Tuple[str, bool]:
+    """Stream output text deltas until the response completes or ``stop_on`` fires.
+
+    Returns the text and whether the stream finished. The read timeout bounds the
+    wait for each event, so a stream that stalls mid-response is abandoned and
+    reopened from the start with the next, longer budget; when the last budget
+    also runs out the partial text is returned as unfinished.
+
+    Usage is only reported on the terminal event, so a stream abandoned early records
+    an estimate from the prompt and the text received instead.
+    """
+    stream_kwargs = dict(request_kwargs, stream=True)
+    accumulated = ""
+    for attempt, is_last, attempt_client, timeout in _attempt_budgets(client, timeouts):
+        if timeout is not None:
+            stream_kwargs["timeout"] = timeout
+        started = time.perf_counter()
+        try:
+            stream = attempt_client.responses.create(**stream_kwargs)
+        except _retryable_errors() as exc:
+            logger.warning(
+                "OpenAI stream attempt %d failed to open after %d ms: %s",
+                attempt,
+                (time.perf_counter() - started) * 1000,
+                exc,
+            )
+            continue
+        except _openai_errors() as exc:  # pragma: no cover - defensive logging
+            logger.error("OpenAI request failed: %s", exc)
+            return "", False
+
+        accumulated, finished, usage_recorded = _read_stream(stream, stop_on)
+        if not usage_recorded:
+            _estimate_usage(request_kwargs.get("input"), accumulated)
+        if finished:
+            logger.debug(
+                "OpenAI stream attempt %d finished in %d ms.",
+                attempt,
+                (time.perf_counter() - started) * 1000,
+            )
+            return accumulated.strip(), True
+        if not is_last:
+            logger.warning(
+                "OpenAI stream attempt %d stalled after %d ms; retrying with a longer timeout.",
+                attempt,
+                (time.perf_counter() - started) * 1000,
+            )
+    return accumulated.strip(), False
@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+_USER_ID_ATTR = "_cached_user_id"
+
 
 def ensure_session_key(request) -> str:
     """Ensure the request has a session key and return it."""
@@ -13,7 +15,26 @@ def ensure_session_key(request) -> str:
 
 
 def resolve_request_user_id(request) -> str:
-    """Return a stable identifier for the current user/session."""
+    """Return a stable identifier for the current user/session.
+
+    The result is memoized on ``request`` because ownership checks call this
+    several times per request.
+    """
+    cached = getattr(request, _USER_ID_ATTR, None)
+    if cached is not None:
+        return cached
     if request.user.is_authenticated:
-        return str(request.user.pk)
-    return str(request.session.get("spotify_user_id") or "anonymous")
+        pk = request.user.pk
+        resolved = pk if isinstance(pk, str) else str(pk)
+    else:
+        spotify_user_id = request.session.get("spotify_user_id") or "anonymous"
+        resolved = spotify_user_id if isinstance(spotify_user_id, str) else str(spotify_user_id)
+    setattr(request, _USER_ID_ATTR, resolved)
+    return resolved
+
+
+def remember_spotify_user_id(request, spotify_user_id: str) -> None:
+    """Store the Spotify user id on the session and drop the memoized identifier."""
+    request.session["spotify_user_id"] = spotify_user_id
+    if hasattr(request, _USER_ID_ATTR):
+        delattr(request, _USER_ID_ATTR)
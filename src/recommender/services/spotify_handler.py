@@ -6,34 +6,52 @@
 # pylint: disable=too-many-branches,too-many-statements,too-many-nested-blocks
 # pylint: disable=too-many-positional-arguments,line-too-long
 
+import functools
+import hashlib
+import heapq
+import json
 import random
 import re
 import time
+import types
 import unicodedata
-from collections import Counter
-from typing import Callable, Dict, Iterable, List, Optional, Set
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
 
 import requests
 from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from requests.adapters import HTTPAdapter
 import spotipy
 from spotipy import SpotifyException
+from urllib3.util.retry import Retry
 
 
 DEFAULT_POPULARITY_THRESHOLD = getattr(settings, "RECOMMENDER_POPULARITY_THRESHOLD", 45)
-GENRE_POPULARITY_OVERRIDES = getattr(
-    settings,
-    "RECOMMENDER_GENRE_POPULARITY_OVERRIDES",
-    {
-        "ambient": 25,
-        "lo-fi": 25,
-        "lofi": 25,
-        "jazz": 30,
-        "classical": 30,
-        "folk": 35,
-        "singer-songwriter": 35,
-    },
+GENRE_POPULARITY_OVERRIDES = types.MappingProxyType(
+    dict(
+        getattr(
+            settings,
+            "RECOMMENDER_GENRE_POPULARITY_OVERRIDES",
+            {
+                "ambient": 25,
+                "lo-fi": 25,
+                "lofi": 25,
+                "jazz": 30,
+                "classical": 30,
+                "folk": 35,
+                "singer-songwriter": 35,
+            },
+        )
+    )
 )
 
+_ARTIST_SPLIT_RE = re.compile(r"\s*(?:,|&|feat\.?|ft\.?|with)\s*")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]")
+
 
 def _log(
     debug_steps: Optional[List[str]],
@@ -47,12 +65,24 @@ def _log(
         debug_steps.append(message)
 
 
+def _sample_names(tracks: List[Dict], count: int = 5) -> List[str]:
+    """Return up to ``count`` track names for debug output."""
+    return [track.get("name") for track in tracks[:count] if track.get("name")]
+
+
+def _ascii_fold(text: str) -> str:
+    """Strip accents and drop non-ascii characters; ascii input is returned untouched."""
+    if text.isascii():
+        return text
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+
+
+@functools.lru_cache(maxsize=8192)
 def _normalize_genre(raw_genre: str) -> str:
     """Normalize a genre string into a lowercase, ascii-safe hyphenated token."""
     if not raw_genre:
         return ""
-    normalized = unicodedata.normalize("NFKD", raw_genre)
-    ascii_clean = normalized.encode("ascii", "ignore").decode("ascii")
+    ascii_clean = _ascii_fold(raw_genre)
     return ascii_clean.strip().lower().replace(" ", "-")
 
 
@@ -61,19 +91,20 @@ def normalize_genre(raw_genre: str) -> str:
     return _normalize_genre(raw_genre)
 
 
+@functools.lru_cache(maxsize=8192)
 def _normalize_artist_key(name: str) -> str:
     """Return a simplified key for fuzzy artist name matching."""
     if not name:
         return ""
-    normalized = unicodedata.normalize("NFKD", name)
-    ascii_clean = normalized.encode("ascii", "ignore").decode("ascii")
-    return re.sub(r"[^a-z0-9]", "", ascii_clean.lower())
+    ascii_clean = _ascii_fold(name)
+    return _NON_ALNUM_RE.sub("", ascii_clean.lower())
 
 
-def _genre_variants(normalized_genre: str) -> Set[str]:
+@functools.lru_cache(maxsize=1024)
+def _genre_variants(normalized_genre: str) -> FrozenSet[str]:
     """Return common permutations of a genre to improve fuzzy matches."""
     if not normalized_genre:
-        return set()
+        return frozenset()
     base = normalized_genre.replace("-", " ")
     compact = base.replace(" ", "")
     variants = {normalized_genre, base, compact}
@@ -83,15 +114,214 @@ def _genre_variants(normalized_genre: str) -> Set[str]:
         variants.update({"r&b", "rb", "r-b"})
     if normalized_genre == "hip-hop":
         variants.add("hiphop")
-    return {v for v in variants if v}
+    return frozenset(v for v in variants if v)
+
+
+@functools.lru_cache(maxsize=1024)
+def _genre_alias_pattern(normalized_genre: str) -> Optional["re.Pattern[str]"]:
+    """Compile one alternation that substring-matches any variant of the genre."""
+    variants = _genre_variants(normalized_genre)
+    if not variants:
+        return None
+    return re.compile("|".join(re.escape(alias) for alias in sorted(variants)))
+
+
+_SESSION_STATE: Dict[str, Optional[requests.Session]] = {"session": None}
+
+
+# Independent Spotify round-trips (artist batches, playlist pages) are fetched concurrently,
+# on an executor owned by the call so one request never queues behind another's fetches.
+_SPOTIFY_FETCH_WORKERS = 4
+
+
+class _SharedSession(requests.Session):
+    """Process-wide session whose pools outlive the clients that borrow it.
+
+    ``spotipy.Spotify.__del__`` closes its session, which would empty the shared
+    connection pools whenever any short-lived client is garbage collected.
+    """
+
+    def close(self) -> None:
+        """Keep pooled connections open; clients do not own this session."""
+
+
+def _shared_requests_session() -> requests.Session:
+    """Return the pooled HTTP session shared by every Spotify client in this process.
+
+    Mirrors spotipy's own retry policy; sharing the session keeps connections to
+    api.spotify.com alive across helpers and requests instead of re-handshaking.
+    """
+    session = _SESSION_STATE["session"]
+    if session is None:
+        retry = Retry(
+            total=3,
+            connect=None,
+            read=False,
+            allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"]),
+            status=3,
+            backoff_factor=0.3,
+            status_forcelist=(429, 500, 502, 503, 504),
+        )
+        # One keep-alive connection per thread that can talk to api.spotify.com at once:
+        # each request thread plus the fetch workers it owns.
+        request_threads = max(1, int(getattr(settings, "RECOMMENDER_SPOTIFY_REQUEST_THREADS", 4)))
+        adapter = HTTPAdapter(
+            pool_maxsize=request_threads * (_SPOTIFY_FETCH_WORKERS + 1), max_retries=retry
+        )
+        session = _SharedSession()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _SESSION_STATE["session"] = session
+    return session
+
+
+def _spotify_client(token: str) -> spotipy.Spotify:
+    """Build a Spotify client for ``token`` on the shared pooled session."""
+    return spotipy.Spotify(auth=token, requests_session=_shared_requests_session())
+
+
+def _fetch_executor(task_count: int) -> ThreadPoolExecutor:
+    """Return a call-scoped executor with no more workers than ``task_count`` needs."""
+    return ThreadPoolExecutor(
+        max_workers=max(1, min(_SPOTIFY_FETCH_WORKERS, task_count)),
+        thread_name_prefix="spotify-fetch",
+    )
+
+
+_SEARCH_CACHE_PREFIX = "spotify:search:"
+_SEARCH_OFFSET_SLOTS = 4
+
+
+def _search_offset(search_limit: int, max_results: int = 100) -> int:
+    """Pick a random search offset from a few fixed slots.
+
+    Offsets still vary between generations, but repeated queries land on one of
+    ``_SEARCH_OFFSET_SLOTS`` pages, so ``_cached_search`` can actually serve them.
+    """
+    offset_cap = max(0, max_results - search_limit)
+    if not offset_cap:
+        return 0
+    slot = random.randrange(_SEARCH_OFFSET_SLOTS)
+    return round(slot * offset_cap / (_SEARCH_OFFSET_SLOTS - 1))
+
+
+def _lookup_cache():
+    """Return the cache for shared Spotify lookups, falling back to the default cache."""
+    try:
+        return caches[getattr(settings, "RECOMMENDER_LOOKUP_CACHE_ALIAS", "default")]
+    except InvalidCacheBackendError:
+        return caches["default"]
+
+
+def _cached_search(sp: spotipy.Spotify, **params: object) -> Dict:
+    """Run ``sp.search`` through the lookup cache; search results are not user-specific."""
+    encoded = json.dumps(params, sort_keys=True, default=str).encode("utf-8")
+    digest = hashlib.sha1(encoded).hexdigest()
+    cache_key = _SEARCH_CACHE_PREFIX + digest
+    lookup_cache = _lookup_cache()
+    cached = lookup_cache.get(cache_key)
+    if isinstance(cached, dict):
+        return cached
+    result = sp.search(**params)
+    if isinstance(result, dict) and result:
+        lookup_cache.set(
+            cache_key,
+            result,
+            timeout=getattr(settings, "RECOMMENDER_SPOTIFY_SEARCH_CACHE_SECONDS", 60 * 10),
+        )
+    return result
+
+
+_ARTIST_BATCH_SIZE = 50
+_ARTIST_CACHE_PREFIX = "spotify:artist:"
+
+
+def _fetch_artists(
+    sp: spotipy.Spotify,
+    artist_ids: Iterable[str],
+    *,
+    debug_steps: Optional[List[str]] = None,
+    log_step: Optional[Callable[[str], None]] = None,
+    purpose: str = "artist metadata",
+    memo: Optional[Dict[str, Dict]] = None,
+) -> Dict[str, Dict]:
+    """Return Spotify artist objects keyed by id, batching, caching, and parallelizing lookups.
+
+    ``memo`` is an optional call-scoped dict checked before the shared cache and filled
+    with every artist returned, so repeated filters within one request skip the cache.
+    """
+    unique_ids = [artist_id for artist_id in dict.fromkeys(artist_ids) if artist_id]
+    if not unique_ids:
+        return {}
+
+    artists: Dict[str, Dict] = {}
+    if memo:
+        for artist_id in unique_ids:
+            record = memo.get(artist_id)
+            if record is not None:
+                artists[artist_id] = record
+        unique_ids = [artist_id for artist_id in unique_ids if artist_id not in artists]
+        if not unique_ids:
+            return artists
+
+    cached = _lookup_cache().get_many([_ARTIST_CACHE_PREFIX + artist_id for artist_id in unique_ids])
+    missing: List[str] = []
+    for artist_id in unique_ids:
+        record = cached.get(_ARTIST_CACHE_PREFIX + artist_id)
+        if isinstance(record, dict):
+            artists[artist_id] = record
+        else:
+            missing.append(artist_id)
+    if not missing:
+        if memo is not None:
+            memo.update(artists)
+        return artists
+
+    batches = [
+        missing[start : start + _ARTIST_BATCH_SIZE]
+        for start in range(0, len(missing), _ARTIST_BATCH_SIZE)
+    ]
+
+    # Batches may run on worker threads, so failures are returned and logged here.
+    def _fetch_batch(batch: List[str]) -> Tuple[List[Dict], Optional[str]]:
+        try:
+            response = sp.artists(batch)
+        except SpotifyException as exc:
+            return [], f"Failed to fetch {purpose}: {exc}."
+        except requests.exceptions.RequestException as exc:
+            return [], f"Network error while fetching {purpose}: {exc}."
+        return (response or {}).get("artists", []) or [], None
+
+    if len(batches) == 1:
+        responses = [_fetch_batch(batches[0])]
+    else:
+        with _fetch_executor(len(batches)) as executor:
+            responses = list(executor.map(_fetch_batch, batches))
+
+    fetched: Dict[str, Dict] = {}
+    for batch_artists, error in responses:
+        if error:
+            _log(debug_steps, log_step, error)
+        for artist in batch_artists:
+            if isinstance(artist, dict) and artist.get("id"):
+                fetched[artist["id"]] = artist
+    if fetched:
+        _lookup_cache().set_many(
+            {_ARTIST_CACHE_PREFIX + artist_id: artist for artist_id, artist in fetched.items()},
+            timeout=getattr(settings, "RECOMMENDER_ARTIST_CACHE_SECONDS", 60 * 60),
+        )
+        artists.update(fetched)
+    if memo is not None:
+        memo.update(artists)
+    return artists
 
 
 def _tracks_to_strings(tracks: List[Dict]) -> List[str]:
     """Render track dictionaries into human-readable strings."""
     return [
-        f"{track['name']} - {track['artists'][0]['name']}"
+        f"{track.get('name', '')} - {artists[0].get('name', '')}"
         for track in tracks
-        if track.get("artists")
+        if (artists := track.get("artists"))
     ]
 
 
@@ -107,6 +337,10 @@ def _filter_by_market(tracks: List[Dict], market: str) -> List[Dict]:
         if not markets:
             filtered.append(track)
             continue
+        # Spotify sends upper-case ISO codes, so a C-level membership test settles most tracks.
+        if isinstance(markets, (list, tuple, set, frozenset)) and normalized_market in markets:
+            filtered.append(track)
+            continue
         if isinstance(markets, Iterable):
             for entry in markets:
                 if isinstance(entry, str) and entry.upper() == normalized_market:
@@ -129,7 +363,7 @@ def _primary_artist_hint(artist: str) -> str:
     """Extract the primary artist name from a formatted credit string."""
     if not artist:
         return ""
-    primary = re.split(r"\s*(?:,|&|feat\.?|ft\.?|with)\s*", artist, maxsplit=1)[0]
+    primary = _ARTIST_SPLIT_RE.split(artist, maxsplit=1)[0]
     return primary.strip()
 
 
@@ -141,6 +375,7 @@ def _filter_tracks_by_artist_genre(
     debug_steps: Optional[List[str]] = None,
     log_step: Optional[Callable[[str], None]] = None,
     popularity_threshold: Optional[int] = None,
+    artist_memo: Optional[Dict[str, Dict]] = None,
 ) -> List[Dict]:
     """Keep tracks whose artists are strongly associated with the target genre."""
     if not tracks:
@@ -150,59 +385,64 @@ def _filter_tracks_by_artist_genre(
 
     artist_id_map: Dict[str, List[str]] = {}
     artist_ids: List[str] = []
+    seen_artists: Set[str] = set()
     for track in tracks:
         ids = [artist.get("id") for artist in track.get("artists", []) if artist.get("id")]
         if ids:
             artist_id_map[track["id"]] = ids
-            artist_ids.extend(ids)
+            for artist_id in ids:
+                if artist_id not in seen_artists:
+                    seen_artists.add(artist_id)
+                    artist_ids.append(artist_id)
 
     if not artist_ids:
         return tracks
 
-    unique_artist_ids = list(dict.fromkeys(artist_ids))
-    artist_details: Dict[str, List[str]] = {}
-
-    for start in range(0, len(unique_artist_ids), 50):
-        batch = unique_artist_ids[start : start + 50]
-        try:
-            response = sp.artists(batch)
-        except SpotifyException as exc:
-            _log(debug_steps, log_step, f"Failed to fetch artist genres: {exc}.")
-            continue
-        except requests.exceptions.RequestException as exc:
-            _log(debug_steps, log_step, f"Network error while fetching artist genres: {exc}.")
-            continue
-        for artist in response.get("artists", []):
-            artist_id = artist.get("id")
-            if artist_id:
-                artist_details[artist_id] = artist.get("genres", [])
+    artist_details: Dict[str, List[str]] = {
+        artist_id: artist.get("genres", [])
+        for artist_id, artist in _fetch_artists(
+            sp,
+            artist_ids,
+            debug_steps=debug_steps,
+            log_step=log_step,
+            purpose="artist genres",
+            memo=artist_memo,
+        ).items()
+    }
 
     if not artist_details:
         return tracks
 
     target = normalized_genre.replace("-", "")
-    threshold = popularity_threshold or _popularity_threshold_for_genre(normalized_genre)
-    filtered_tracks: List[Dict] = []
+    alias_exact = genre_aliases
+    alias_substr_re = _genre_alias_pattern(normalized_genre)
+
+    def _genre_matches(genre: str) -> bool:
+        normalized = genre.lower()
+        canonical = normalized.replace(" ", "").replace("-", "")
+        return bool(
+            (target and target in canonical)
+            or normalized in alias_exact
+            or (alias_substr_re is not None and alias_substr_re.search(canonical))
+        )
 
-    for track in tracks:
-        if track.get("popularity", 0) < threshold:
-            continue
-        matched = False
-        for artist_id in artist_id_map.get(track["id"], []):
-            genres = artist_details.get(artist_id, [])
-            for genre in genres:
-                normalized = genre.lower()
-                canonical = normalized.replace(" ", "").replace("-", "")
-                if (target and target in canonical) or any(
-                    alias == normalized or alias == canonical or alias in canonical
-                    for alias in genre_aliases
-                ):
-                    matched = True
-                    break
-            if matched:
-                break
-        if matched:
-            filtered_tracks.append(track)
+    # Artists share many genre tags, so each distinct tag is tested once and each artist
+    # is then decided by a set probe; tracks only look up their artists' verdicts.
+    distinct_genres = {genre for genres in artist_details.values() for genre in genres}
+    matching_genres = {genre for genre in distinct_genres if _genre_matches(genre)}
+    matching_artists = {
+        artist_id
+        for artist_id, genres in artist_details.items()
+        if not matching_genres.isdisjoint(genres)
+    }
+
+    threshold = popularity_threshold or _popularity_threshold_for_genre(normalized_genre)
+    filtered_tracks = [
+        track
+        for track in tracks
+        if track.get("popularity", 0) >= threshold
+        and any(artist_id in matching_artists for artist_id in artist_id_map.get(track["id"], []))
+    ]
 
     _log(
         debug_steps,
@@ -213,15 +453,24 @@ def _filter_tracks_by_artist_genre(
     return filtered_tracks or tracks
 
 
+@functools.lru_cache(maxsize=4096)
+def _is_latin_char(char: str) -> bool:
+    """Return True when ``char`` belongs to the Latin script."""
+    return char < "\u0080" or "LATIN" in unicodedata.name(char, "")
+
+
 def _is_mostly_latin(text: str) -> bool:
     """Heuristic that checks whether a string primarily uses latin characters."""
-    if not text:
+    if not text or text.isascii():
         return True
-    alpha_chars = [c for c in text if c.isalpha()]
-    if not alpha_chars:
+    alpha = latin = 0
+    for char in text:
+        if char.isalpha():
+            alpha += 1
+            latin += _is_latin_char(char)
+    if not alpha:
         return True
-    latin = sum(1 for c in alpha_chars if "LATIN" in unicodedata.name(c, ""))
-    return latin / len(alpha_chars) >= 0.4
+    return latin / alpha >= 0.4
 
 
 def _filter_non_latin_tracks(tracks: Iterable[Dict]) -> List[Dict]:
@@ -235,13 +484,12 @@ def _extract_release_year(track: Dict) -> Optional[int]:
     date = album.get("release_date") or track.get("release_date")
     if not date:
         return None
-    match = re.match(r"(\d{4})", date)
-    if not match:
-        return None
-    try:
-        return int(match.group(1))
-    except ValueError:
+    # Spotify release dates are "YYYY", "YYYY-MM", or "YYYY-MM-DD".
+    year = date[:4]
+    # isascii() rules out non-ASCII digits that isdigit() accepts but int() rejects.
+    if len(year) != 4 or not (year.isascii() and year.isdigit()):
         return None
+    return int(year)
 
 
 def _primary_image_url(images: Optional[List[Dict]]) -> str:
@@ -255,21 +503,41 @@ def _primary_image_url(images: Optional[List[Dict]]) -> str:
     return ""
 
 
-def _serialize_track_payload(track: Dict) -> Dict[str, object]:
-    """Normalize Spotify track metadata for downstream views and caching."""
+def _artist_label(track: Dict) -> str:
+    """Join a track's non-empty artist names for display, defaulting to ``"Unknown"``."""
+    return (
+        ", ".join([name for artist in track.get("artists") or () if (name := artist.get("name"))])
+        or "Unknown"
+    )
+
+
+def _serialize_track_payload(track: Dict, **extra: object) -> Dict[str, object]:
+    """Normalize Spotify track metadata for downstream views and caching.
+
+    Keyword arguments are added to the payload, so callers tagging a source
+    build the dictionary in one step; a ``year`` argument skips re-parsing the date.
+    """
     album = track.get("album") or {}
-    artists = track.get("artists") or []
-    artist_names = ", ".join(artist.get("name", "") for artist in artists if artist.get("name"))
+    names: List[str] = []
+    artist_ids: List[str] = []
+    for artist in track.get("artists") or ():
+        name = artist.get("name")
+        if name:
+            names.append(name)
+        artist_id = artist.get("id")
+        if artist_id:
+            artist_ids.append(artist_id)
     return {
         "id": track.get("id"),
         "name": track.get("name", "Unknown"),
-        "artists": artist_names or "Unknown",
+        "artists": ", ".join(names) or "Unknown",
         "album_name": album.get("name", ""),
         "album_image_url": _primary_image_url(album.get("images")),
         "duration_ms": int(track.get("duration_ms") or 0),
-        "artist_ids": [artist.get("id") for artist in artists if artist.get("id")],
-        "year": _extract_release_year(track),
+        "artist_ids": artist_ids,
+        "year": extra["year"] if "year" in extra else _extract_release_year(track),
         "popularity": int(track.get("popularity") or 0),
+        **extra,
     }
 
 
@@ -349,30 +617,18 @@ def compute_playlist_statistics(
 
     genre_distribution: Dict[str, float] = {}
     if artist_ids and token:
-        unique_artist_ids = list(dict.fromkeys(artist_ids))
         artist_genre_map: Dict[str, List[str]] = {}
-        sp = spotipy.Spotify(auth=token)
-        for start in range(0, len(unique_artist_ids), 50):
-            batch = unique_artist_ids[start : start + 50]
-            try:
-                response = sp.artists(batch)
-            except SpotifyException as exc:
-                _log(None, log_step, f"Spotify artist lookup failed while computing stats: {exc}.")
-                continue
-            except requests.exceptions.RequestException as exc:
-                _log(None, log_step, f"Network error during artist lookup for stats: {exc}.")
-                continue
-
-            for artist in response.get("artists", []) or []:
-                artist_id = artist.get("id")
-                if not artist_id:
-                    continue
-                normalized_genres = [
-                    genre
-                    for genre in {_normalize_genre(raw) for raw in artist.get("genres", []) or []}
-                    if genre
-                ]
-                artist_genre_map[artist_id] = normalized_genres
+        sp = _spotify_client(token)
+        fetched_artists = _fetch_artists(
+            sp, artist_ids, log_step=log_step, purpose="artist genres for stats"
+        )
+        for artist_id, artist in fetched_artists.items():
+            normalized_genres = [
+                genre
+                for genre in {_normalize_genre(raw) for raw in artist.get("genres", []) or []}
+                if genre
+            ]
+            artist_genre_map[artist_id] = normalized_genres
 
         if artist_genre_map:
             genre_weights: Dict[str, float] = {}
@@ -530,7 +786,6 @@ def build_user_profile_seed_snapshot(
     seen_track_ids: Set[str] = set()
     track_payloads: List[Dict[str, object]] = []
     artist_counts: Counter[str] = Counter()
-    artist_order: List[str] = []
 
     for track in raw_tracks:
         if not isinstance(track, dict):
@@ -539,65 +794,61 @@ def build_user_profile_seed_snapshot(
         if not track_id or track_id in seen_track_ids:
             continue
         seen_track_ids.add(track_id)
-        payload = _serialize_track_payload(track)
-        payload["popularity"] = int(track.get("popularity") or 0)
-        payload["source"] = source_label
-        payload["genres"] = []  # populated after artist lookup
+        # Genres are populated after the artist lookup.
+        payload = _serialize_track_payload(track, source=source_label, genres=[])
         track_payloads.append(payload)
-        for artist in track.get("artists", []) or []:
-            artist_id = artist.get("id")
-            if artist_id:
-                artist_counts[artist_id] += 1
-                artist_order.append(artist_id)
+        artist_counts.update(payload["artist_ids"])
 
     if not track_payloads:
         _log(debug_steps, log_step, "Seed snapshot stopped; no eligible tracks after dedupe.")
         return None
 
-    unique_artist_ids = list(dict.fromkeys(artist_order))
+    # Counter keeps first-seen order, so its keys are already the de-duplicated artist ids.
+    unique_artist_ids = list(artist_counts)
     if not unique_artist_ids:
         _log(debug_steps, log_step, "Seed snapshot stopped; no artist identifiers available.")
         return None
 
     artist_details: Dict[str, Dict[str, object]] = {}
-    for start in range(0, len(unique_artist_ids), 50):
-        batch = unique_artist_ids[start : start + 50]
-        try:
-            response = sp.artists(batch)
-        except SpotifyException as exc:
-            _log(debug_steps, log_step, f"Failed to fetch artist metadata: {exc}.")
-            continue
-        except requests.exceptions.RequestException as exc:
-            _log(debug_steps, log_step, f"Network error fetching artist metadata: {exc}.")
-            continue
-
-        for artist in response.get("artists", []) or []:
-            if not isinstance(artist, dict):
-                continue
-            artist_id = artist.get("id")
-            if not artist_id:
-                continue
-            normalized_genres = [
-                genre
-                for genre in {normalize_genre(raw) for raw in artist.get("genres", []) or []}
-                if genre
-            ]
-            artist_details[artist_id] = {
-                "id": artist_id,
-                "name": artist.get("name", ""),
-                "genres": normalized_genres,
-                "image": _primary_image_url(artist.get("images")),
-                "popularity": int(artist.get("popularity") or 0),
-                "followers": int((artist.get("followers") or {}).get("total") or 0),
-                "url": (artist.get("external_urls") or {}).get("spotify", ""),
-            }
+    fetched_artists = _fetch_artists(
+        sp, unique_artist_ids, debug_steps=debug_steps, log_step=log_step
+    )
+    for artist_id, artist in fetched_artists.items():
+        normalized_genres = [
+            genre
+            for genre in {normalize_genre(raw) for raw in artist.get("genres", []) or []}
+            if genre
+        ]
+        artist_details[artist_id] = {
+            "id": artist_id,
+            "name": artist.get("name", ""),
+            "genres": normalized_genres,
+            "image": _primary_image_url(artist.get("images")),
+            "popularity": int(artist.get("popularity") or 0),
+            "followers": int((artist.get("followers") or {}).get("total") or 0),
+            "url": (artist.get("external_urls") or {}).get("spotify", ""),
+        }
 
     if not artist_details:
         _log(debug_steps, log_step, "Seed snapshot stopped; artist metadata unavailable.")
         return None
 
-    genre_buckets: Dict[str, Dict[str, object]] = {}
+    genre_buckets: Dict[str, Dict[str, object]] = defaultdict(
+        lambda: {
+            "track_ids": [],
+            "artist_ids": [],
+            "artist_seen": set(),
+            "popularity_total": 0,
+            "year_total": 0,
+            "year_count": 0,
+        }
+    )
+    per_genre_limit = 12
+    bucket_artist_limit = per_genre_limit * 2
     track_lookup: Dict[str, Dict[str, object]] = {}
+    artist_tracks: Dict[str, List[str]] = defaultdict(list)
+    # (popularity, year) per track id, computed once and reused by every ranking below.
+    rank_keys: Dict[str, Tuple[int, int]] = {}
 
     for payload in track_payloads:
         track_id = payload.get("id")
@@ -614,22 +865,23 @@ def build_user_profile_seed_snapshot(
                     genre_set.add(genre)
         payload["genres"] = sorted(genre_set)
         track_lookup[track_id] = payload
+        rank_keys[track_id] = (payload.get("popularity", 0), payload.get("year") or 0)
+        for artist_id in dict.fromkeys(artist_ids):
+            artist_tracks[artist_id].append(track_id)
 
         for genre in payload["genres"]:
             if not genre:
                 continue
-            bucket = genre_buckets.setdefault(
-                genre,
-                {
-                    "track_ids": [],
-                    "artist_ids": [],
-                    "popularity_total": 0,
-                    "year_total": 0,
-                    "year_count": 0,
-                },
-            )
+            bucket = genre_buckets[genre]
             bucket["track_ids"].append(track_id)
-            bucket["artist_ids"].extend(artist_ids)
+            bucket_artists = bucket["artist_ids"]
+            bucket_seen = bucket["artist_seen"]
+            for artist_id in artist_ids:
+                if len(bucket_artists) >= bucket_artist_limit:
+                    break
+                if artist_id and artist_id not in bucket_seen:
+                    bucket_seen.add(artist_id)
+                    bucket_artists.append(artist_id)
             bucket["popularity_total"] += payload.get("popularity", 0)
             year = payload.get("year")
             if isinstance(year, int):
@@ -637,22 +889,13 @@ def build_user_profile_seed_snapshot(
                 bucket["year_count"] += 1
 
     formatted_buckets: Dict[str, Dict[str, object]] = {}
-    per_genre_limit = 12
     for genre, bucket in genre_buckets.items():
         track_ids = bucket.get("track_ids", [])
         track_ids = [track_id for track_id in track_ids if track_id in track_lookup]
-        sorted_ids = sorted(
-            track_ids,
-            key=lambda track_id: (
-                track_lookup[track_id].get("popularity", 0),
-                track_lookup[track_id].get("year") or 0,
-            ),
-            reverse=True,
-        )
-        artist_ids = [aid for aid in bucket.get("artist_ids", []) if aid]
+        top_ids = heapq.nlargest(per_genre_limit, track_ids, key=rank_keys.__getitem__)
         formatted_buckets[genre] = {
-            "track_ids": sorted_ids[:per_genre_limit],
-            "artist_ids": list(dict.fromkeys(artist_ids))[: per_genre_limit * 2],
+            "track_ids": top_ids,
+            "artist_ids": bucket["artist_ids"],
             "avg_popularity": bucket["popularity_total"] / max(len(track_ids), 1),
             "avg_year": (
                 bucket["year_total"] / bucket["year_count"] if bucket["year_count"] else None
@@ -662,6 +905,7 @@ def build_user_profile_seed_snapshot(
 
     artist_snapshot: Dict[str, Dict[str, object]] = {}
     artist_name_map: Dict[str, str] = {}
+    artist_name_keys: List[List[str]] = []
     for artist_id, info in artist_details.items():
         artist_snapshot[artist_id] = {
             "id": artist_id,
@@ -676,13 +920,13 @@ def build_user_profile_seed_snapshot(
         normalized_key = _normalize_artist_key(info.get("name", ""))
         if normalized_key:
             artist_name_map[normalized_key] = artist_id
+            artist_name_keys.append([normalized_key, artist_id])
 
-    top_tracks_sorted = sorted(
-        list(track_lookup.values()),
-        key=lambda item: (item.get("popularity", 0), item.get("year") or 0),
-        reverse=True,
-    )
-    top_track_ids = [item.get("id") for item in top_tracks_sorted if item.get("id")]
+    # Pre-sort each artist's tracks in the order cached_tracks_for_artist returns them.
+    for track_ids in artist_tracks.values():
+        track_ids.sort(key=rank_keys.__getitem__, reverse=True)
+
+    top_track_ids = heapq.nlargest(50, rank_keys, key=rank_keys.__getitem__)
 
     snapshot: Dict[str, object] = {
         "created_at": time.time(),
@@ -693,7 +937,9 @@ def build_user_profile_seed_snapshot(
         "artist_counts": {artist_id: int(count) for artist_id, count in artist_counts.items()},
         "artists": artist_snapshot,
         "artist_name_map": artist_name_map,
-        "top_track_ids": top_track_ids[:50],
+        "artist_name_keys": artist_name_keys,
+        "artist_tracks": dict(artist_tracks),
+        "top_track_ids": top_track_ids,
     }
 
     return snapshot
@@ -749,6 +995,16 @@ def cached_tracks_for_artist(
     if not isinstance(track_lookup, dict):
         return []
 
+    artist_tracks = profile_cache.get("artist_tracks")
+    if isinstance(artist_tracks, dict):
+        track_ids = artist_tracks.get(artist_id) or []
+        return [
+            dict(track_lookup[track_id])
+            for track_id in track_ids[:limit]
+            if isinstance(track_lookup.get(track_id), dict)
+        ]
+
+    # Snapshots built before the artist index existed fall back to a full scan.
     matches: List[Dict[str, object]] = []
     for track in track_lookup.values():
         if not isinstance(track, dict):
@@ -775,20 +1031,27 @@ def cached_artist_id_for_hint(
         return None
 
     name_map = profile_cache.get("artist_name_map")
-    if isinstance(name_map, dict):
-        artist_id = name_map.get(normalized_hint)
-        if artist_id:
+    if isinstance(name_map, dict) and name_map.get(normalized_hint):
+        return name_map[normalized_hint]
+
+    return _partial_artist_match(profile_cache, normalized_hint)
+
+
+def _partial_artist_match(profile_cache: Dict[str, object], normalized_hint: str) -> Optional[str]:
+    """Return the first cached artist, in snapshot order, whose name contains the hint."""
+    name_keys = profile_cache.get("artist_name_keys")
+    if not isinstance(name_keys, list):
+        # Snapshots stored before artist_name_keys existed normalize names on the fly.
+        artists = profile_cache.get("artists")
+        if not isinstance(artists, dict):
+            return None
+        name_keys = [
+            (_normalize_artist_key((info or {}).get("name", "")), artist_id)
+            for artist_id, info in artists.items()
+        ]
+    for name_key, artist_id in name_keys:
+        if name_key and normalized_hint in name_key:
             return artist_id
-
-    artists = profile_cache.get("artists")
-    if isinstance(artists, dict):
-        for artist_id, info in artists.items():
-            name = _normalize_artist_key((info or {}).get("name", ""))
-            if name and normalized_hint == name:
-                return artist_id
-            if name and normalized_hint in name:
-                return artist_id
-
     return None
 
 
@@ -807,7 +1070,7 @@ def ensure_artist_seed(
     if not artist_hint:
         return None
 
-    sp = spotipy.Spotify(auth=token)
+    sp = _spotify_client(token)
     cached_artist_id = cached_artist_id_for_hint(profile_cache, artist_hint)
     resolved_artist_id: Optional[str] = cached_artist_id
     resolved_artist_name: Optional[str] = None
@@ -821,7 +1084,7 @@ def ensure_artist_seed(
     if not resolved_artist_id:
         query = f'artist:"{artist_hint}"'
         try:
-            search_result = sp.search(q=query, type="artist", limit=3)
+            search_result = _cached_search(sp, q=query, type="artist", limit=3)
             artist_items = search_result.get("artists", {}).get("items", [])
         except SpotifyException as exc:
             _log(debug_steps, log_step, f"Spotify artist search failed for '{artist_hint}': {exc}.")
@@ -890,9 +1153,7 @@ def ensure_artist_seed(
         if not track_id or track_id in seen_ids:
             continue
         seen_ids.add(track_id)
-        payload = _serialize_track_payload(track)
-        payload["popularity"] = int(track.get("popularity") or 0)
-        payload["seed_source"] = "artist_top_tracks"
+        payload = _serialize_track_payload(track, seed_source="artist_top_tracks")
         payloads.append(payload)
         if len(payloads) >= seed_limit:
             break
@@ -935,7 +1196,7 @@ def _discover_playlist_seeds(
     query = random.choice(playlist_queries)
     _log(debug_steps, log_step, f"Spotify API → search playlists: q='{query}', limit={playlist_limit}")
     try:
-        playlists = sp.search(q=query, type="playlist", limit=playlist_limit)
+        playlists = _cached_search(sp, q=query, type="playlist", limit=playlist_limit)
         playlist_items = playlists.get("playlists", {}).get("items", [])
     except SpotifyException as exc:
         _log(debug_steps, log_step, f"Spotify playlist search failed: {exc}.")
@@ -944,6 +1205,13 @@ def _discover_playlist_seeds(
     collected: List[Dict] = []
     seen_ids: Set[str] = set()
 
+    def _fetch_playlist_items(playlist_id: str) -> Optional[Dict]:
+        try:
+            return sp.playlist_items(playlist_id, limit=track_limit, market=market)
+        except SpotifyException:
+            return sp.playlist_items(playlist_id, limit=track_limit)
+
+    playlist_ids: List[str] = []
     for playlist in playlist_items:
         if not isinstance(playlist, dict):
             continue
@@ -958,11 +1226,17 @@ def _discover_playlist_seeds(
             log_step,
             f"Spotify API → playlist_items: playlist_id={playlist_id}, limit={track_limit}, market={market}",
         )
-        try:
-            response = sp.playlist_items(playlist_id, limit=track_limit, market=market)
-        except SpotifyException:
+        playlist_ids.append(playlist_id)
+
+    with _fetch_executor(len(playlist_ids)) as executor:
+        pending = [
+            (playlist_id, executor.submit(_fetch_playlist_items, playlist_id))
+            for playlist_id in playlist_ids
+        ]
+        # Results are merged in search order so de-duplication stays deterministic.
+        for playlist_id, future in pending:
             try:
-                response = sp.playlist_items(playlist_id, limit=track_limit)
+                response = future.result()
             except SpotifyException:
                 continue
             except requests.exceptions.RequestException as exc:
@@ -972,20 +1246,13 @@ def _discover_playlist_seeds(
                     f"Network error fetching playlist items for '{playlist_id}': {exc}.",
                 )
                 continue
-        except requests.exceptions.RequestException as exc:
-            _log(
-                debug_steps,
-                log_step,
-                f"Network error fetching playlist items for '{playlist_id}': {exc}.",
-            )
-            continue
-        items = response.get("items", [])
-        for entry in items:
-            track = entry.get("track")
-            if not track or not track.get("id") or track["id"] in seen_ids:
-                continue
-            seen_ids.add(track["id"])
-            collected.append(track)
+            items = (response or {}).get("items", [])
+            for entry in items:
+                track = entry.get("track")
+                if not track or not track.get("id") or track["id"] in seen_ids:
+                    continue
+                seen_ids.add(track["id"])
+                collected.append(track)
 
     _log(
         debug_steps,
@@ -1007,9 +1274,12 @@ def discover_top_tracks_for_genre(
     search_limit: int = 50,
 ) -> List[Dict[str, str]]:
     """Return a curated list of genre-specific tracks to bootstrap recommendations."""
-    sp = spotipy.Spotify(auth=token)
+    sp = _spotify_client(token)
     normalized_genre = _normalize_genre(attributes.get("genre", "pop") or "pop")
     query = f'genre:"{normalized_genre}"'
+    # Playlist and search candidates share many artists; resolve each one once per call.
+    artist_memo: Dict[str, Dict] = {}
+    filter_non_latin = _should_filter_non_latin()
 
     playlist_tracks = _discover_playlist_seeds(
         sp,
@@ -1024,8 +1294,9 @@ def discover_top_tracks_for_genre(
         normalized_genre,
         debug_steps=debug_steps,
         log_step=log_step,
+        artist_memo=artist_memo,
     )
-    if _should_filter_non_latin():
+    if filter_non_latin:
         playlist_tracks = _filter_non_latin_tracks(playlist_tracks)
     playlist_tracks.sort(key=lambda t: t.get("popularity", 0), reverse=True)
 
@@ -1044,7 +1315,7 @@ def discover_top_tracks_for_genre(
                 {
                     "id": track["id"],
                     "name": track["name"],
-                    "artists": ", ".join(artist.get("name", "") for artist in track.get("artists", [])),
+                    "artists": _artist_label(track),
                     "artist_ids": artist_ids,
                     "year": _extract_release_year(track),
                     "popularity": int(track.get("popularity") or 0),
@@ -1054,20 +1325,21 @@ def discover_top_tracks_for_genre(
 
     selected = _collect(playlist_tracks)
 
-    sample_names = [track.get("name") for track in playlist_tracks[:5] if track.get("name")]
+    sample_names = _sample_names(playlist_tracks)
     if sample_names:
         _log(debug_steps, log_step, f"Playlist seed sample: {sample_names}")
 
     if len(selected) < seed_limit:
         tracks: List[Dict] = []
         try:
-            offset = random.randint(0, max(0, 100 - search_limit)) if search_limit < 100 else 0
+            offset = _search_offset(search_limit)
             _log(
                 debug_steps,
                 log_step,
                 f"Spotify API → search tracks (genre seed): q='{query}', limit={search_limit}, market={market}, offset={offset}",
             )
-            tracks = sp.search(
+            tracks = _cached_search(
+                sp,
                 q=query,
                 type="track",
                 limit=search_limit,
@@ -1087,8 +1359,9 @@ def discover_top_tracks_for_genre(
                     log_step,
                     f"Spotify API → search tracks (no market): q='{query}', limit={search_limit}",
                 )
-                fallback_offset = random.randint(0, max(0, 100 - search_limit)) if search_limit < 100 else 0
-                tracks = sp.search(
+                fallback_offset = _search_offset(search_limit)
+                tracks = _cached_search(
+                    sp,
                     q=query,
                     type="track",
                     limit=search_limit,
@@ -1108,17 +1381,21 @@ def discover_top_tracks_for_genre(
                 normalized_genre,
                 debug_steps=debug_steps,
                 log_step=log_step,
+                artist_memo=artist_memo,
             )
-            if _should_filter_non_latin():
+            if filter_non_latin:
                 tracks = _filter_non_latin_tracks(tracks)
             tracks.sort(key=lambda t: t.get("popularity", 0), reverse=True)
-            sample_names = [track.get("name") for track in tracks[:5] if track.get("name")]
+            sample_names = _sample_names(tracks)
             if sample_names:
                 _log(debug_steps, log_step, f"Search seed sample: {sample_names}")
 
-            additional = _collect(tracks)
-            for track in additional:
-                if track not in selected and len(selected) < seed_limit:
+            selected_ids = {track["id"] for track in selected}
+            for track in _collect(tracks):
+                if len(selected) >= seed_limit:
+                    break
+                if track["id"] not in selected_ids:
+                    selected_ids.add(track["id"])
                     selected.append(track)
 
     _log(
@@ -1130,6 +1407,76 @@ def discover_top_tracks_for_genre(
     return selected
 
 
+def _resolve_seed_suggestion(
+    sp: spotipy.Spotify,
+    suggestion: Dict[str, str],
+    market: str,
+    filter_non_latin: bool,
+) -> tuple[Optional[Dict[str, object]], List[str]]:
+    """Search Spotify for one suggestion, returning its payload and the log lines it produced.
+
+    Runs on the Spotify executor, so messages are collected and replayed by the caller.
+    """
+    messages: List[str] = []
+    title = suggestion.get("title", "").strip()
+    artist = suggestion.get("artist", "").strip()
+
+    primary_artist = _primary_artist_hint(artist)
+    query_parts = [f'track:"{title}"']
+    if artist:
+        query_parts.append(f'artist:"{artist}"')
+    query = " ".join(query_parts)
+
+    tracks: List[Dict] = []
+    try:
+        messages.append(f'Spotify API → search track: q="{query}", limit=5, market={market}')
+        tracks = _cached_search(sp, q=query, type="track", limit=5, market=market).get("tracks", {}).get("items", [])
+        tracks = _filter_by_market(tracks, market)
+        if filter_non_latin:
+            tracks = _filter_non_latin_tracks(tracks)
+    except SpotifyException as exc:
+        messages.append(f"Spotify search failed for '{query}' with market {market}: {exc}.")
+    except requests.exceptions.RequestException as exc:
+        messages.append(f"Network error during Spotify search for '{query}': {exc}.")
+
+    if not tracks and primary_artist and primary_artist != artist:
+        fallback_query = f'track:"{title}" artist:"{primary_artist}"'
+        try:
+            messages.append(f'Spotify API → search track (primary artist): q="{fallback_query}", limit=5, market={market}')
+            tracks = _cached_search(sp, q=fallback_query, type="track", limit=5, market=market).get("tracks", {}).get("items", [])
+            tracks = _filter_by_market(tracks, market)
+            if filter_non_latin:
+                tracks = _filter_non_latin_tracks(tracks)
+        except SpotifyException as exc:
+            messages.append(f"Spotify search failed for '{fallback_query}' with market {market}: {exc}.")
+        except requests.exceptions.RequestException as exc:
+            messages.append(f"Network error during fallback Spotify search '{fallback_query}': {exc}.")
+
+    if not tracks:
+        try:
+            messages.append(f'Spotify API → search track (no market): q="{query}", limit=5')
+            tracks = _cached_search(sp, q=query, type="track", limit=5).get("tracks", {}).get("items", [])
+            if filter_non_latin:
+                tracks = _filter_non_latin_tracks(tracks)
+        except SpotifyException as exc:
+            messages.append(f"Spotify search retry without market failed for '{query}': {exc}.")
+            return None, messages
+        except requests.exceptions.RequestException as exc:
+            messages.append(f"Network error during Spotify search retry for '{query}': {exc}.")
+            return None, messages
+
+    if not tracks:
+        messages.append(f"No search results found for '{title}' ({artist}).")
+        return None, messages
+
+    suggestion_source = suggestion.get("seed_source") or suggestion.get("source")
+    seed_label = suggestion_source or "resolved_seed"
+    payload = _serialize_track_payload(tracks[0])
+    payload.setdefault("seed_source", seed_label)
+    payload.setdefault("source", seed_label)
+    return payload, messages
+
+
 def resolve_seed_tracks(
     suggestions: List[Dict[str, str]],
     token: str,
@@ -1140,76 +1487,69 @@ def resolve_seed_tracks(
     limit: int = 5,
 ) -> List[Dict[str, str]]:
     """Resolve LLM-provided suggestions into concrete Spotify track metadata."""
-    sp = spotipy.Spotify(auth=token)
+    sp = _spotify_client(token)
     resolved: List[Dict[str, str]] = []
 
-    for suggestion in suggestions:
-        if len(resolved) >= limit:
-            break
+    candidates = [suggestion for suggestion in suggestions if suggestion.get("title", "").strip()]
+    filter_non_latin = _should_filter_non_latin()
+    # Suggestions resolve independently, so each wave searches just enough of them in
+    # parallel to fill the remaining slots; results are merged in suggestion order.
+    with _fetch_executor(limit) as executor:
+        while candidates and len(resolved) < limit:
+            wave = candidates[: limit - len(resolved)]
+            candidates = candidates[len(wave) :]
+            futures = [
+                executor.submit(_resolve_seed_suggestion, sp, suggestion, market, filter_non_latin)
+                for suggestion in wave
+            ]
+            for future in futures:
+                payload, messages = future.result()
+                for message in messages:
+                    _log(debug_steps, log_step, message)
+                if payload is not None:
+                    resolved.append(payload)
 
-        title = suggestion.get("title", "").strip()
-        artist = suggestion.get("artist", "").strip()
-        if not title:
-            continue
+    _log(debug_steps, log_step, f"Resolved {len(resolved)} seed tracks via Spotify search.")
+    return resolved
 
-        primary_artist = _primary_artist_hint(artist)
-        query_parts = [f'track:"{title}"']
-        if artist:
-            query_parts.append(f'artist:"{artist}"')
-        query = " ".join(query_parts)
 
-        tracks: List[Dict] = []
-        try:
-            _log(debug_steps, log_step, f'Spotify API → search track: q="{query}", limit=5, market={market}')
-            tracks = sp.search(q=query, type="track", limit=5, market=market).get("tracks", {}).get("items", [])
-            tracks = _filter_by_market(tracks, market)
-            if _should_filter_non_latin():
-                tracks = _filter_non_latin_tracks(tracks)
-        except SpotifyException as exc:
-            _log(debug_steps, log_step, f"Spotify search failed for '{query}' with market {market}: {exc}.")
-        except requests.exceptions.RequestException as exc:
-            _log(debug_steps, log_step, f"Network error during Spotify search for '{query}': {exc}.")
+@dataclass(frozen=True)
+class _ScoringContext:
+    """Profile-cache lookups shared by every candidate scored in one pass."""
 
-        if not tracks and primary_artist and primary_artist != artist:
-            fallback_query = f'track:"{title}" artist:"{primary_artist}"'
-            try:
-                _log(debug_steps, log_step, f'Spotify API → search track (primary artist): q="{fallback_query}", limit=5, market={market}')
-                tracks = sp.search(q=fallback_query, type="track", limit=5, market=market).get("tracks", {}).get("items", [])
-                tracks = _filter_by_market(tracks, market)
-                if _should_filter_non_latin():
-                    tracks = _filter_non_latin_tracks(tracks)
-            except SpotifyException as exc:
-                _log(debug_steps, log_step, f"Spotify search failed for '{fallback_query}' with market {market}: {exc}.")
-            except requests.exceptions.RequestException as exc:
-                _log(debug_steps, log_step, f"Network error during fallback Spotify search '{fallback_query}': {exc}.")
+    cached_tracks: FrozenSet[str] = frozenset()
+    genre_track_ids: FrozenSet[str] = frozenset()
+    artist_counts: Optional[Dict[str, int]] = None
 
-        if not tracks:
-            try:
-                _log(debug_steps, log_step, f'Spotify API → search track (no market): q="{query}", limit=5')
-                tracks = sp.search(q=query, type="track", limit=5).get("tracks", {}).get("items", [])
-                if _should_filter_non_latin():
-                    tracks = _filter_non_latin_tracks(tracks)
-            except SpotifyException as exc:
-                _log(debug_steps, log_step, f"Spotify search retry without market failed for '{query}': {exc}.")
-                continue
-            except requests.exceptions.RequestException as exc:
-                _log(debug_steps, log_step, f"Network error during Spotify search retry for '{query}': {exc}.")
-                continue
 
-        if not tracks:
-            _log(debug_steps, log_step, f"No search results found for '{title}' ({artist}).")
-            continue
+def _scoring_context(
+    profile_cache: Optional[Dict[str, object]],
+    target_genre: Optional[str],
+) -> _ScoringContext:
+    """Flatten the profile cache into the sets ``_score_track_basic`` probes per candidate."""
+    if not profile_cache:
+        return _ScoringContext()
 
-        track = tracks[0]
-        payload = _serialize_track_payload(track)
-        suggestion_source = suggestion.get("seed_source") or suggestion.get("source")
-        seed_label = suggestion_source or "resolved_seed"
-        payload.setdefault("seed_source", seed_label)
-        payload.setdefault("source", seed_label)
-        resolved.append(payload)
+    cached_tracks: FrozenSet[str] = frozenset()
+    track_lookup = profile_cache.get("tracks")
+    if isinstance(track_lookup, dict):
+        cached_tracks = frozenset(
+            track_id for track_id, record in track_lookup.items() if isinstance(record, dict)
+        )
 
-    _log(debug_steps, log_step, f"Resolved {len(resolved)} seed tracks via Spotify search.")
-    return resolved
+    genre_track_ids: FrozenSet[str] = frozenset()
+    genre_buckets = profile_cache.get("genre_buckets")
+    if target_genre and isinstance(genre_buckets, dict):
+        genre_bucket = genre_buckets.get(target_genre)
+        if isinstance(genre_bucket, dict):
+            genre_track_ids = frozenset(genre_bucket.get("track_ids") or ())
+
+    artist_counts = profile_cache.get("artist_counts")
+    return _ScoringContext(
+        cached_tracks=cached_tracks,
+        genre_track_ids=genre_track_ids,
+        artist_counts=artist_counts if isinstance(artist_counts, dict) else None,
+    )
 
 
 def _score_track_basic(
@@ -1222,8 +1562,16 @@ def _score_track_basic(
     profile_cache: Optional[Dict[str, object]] = None,
     focus_artist_ids: Optional[Set[str]] = None,
     target_genre: Optional[str] = None,
+    context: Optional[_ScoringContext] = None,
+    release_year: Optional[int] = None,
 ) -> tuple[float, Dict[str, float]]:
-    """Assign a heuristic score to rank candidates while blending affinity and novelty."""
+    """Assign a heuristic score to rank candidates while blending affinity and novelty.
+
+    Callers scoring many candidates pass a ``context`` built once by ``_scoring_context``
+    and may pass an already parsed ``release_year``.
+    """
+    if context is None:
+        context = _scoring_context(profile_cache, target_genre)
 
     breakdown: Dict[str, float] = {}
     popularity = int(track.get("popularity", 40) or 0)
@@ -1231,17 +1579,18 @@ def _score_track_basic(
     score = popularity_score
     breakdown["popularity"] = round(popularity_score, 4)
 
-    artists = track.get("artists") or []
-    artist_ids = {artist.get("id") for artist in artists if artist.get("id")}
+    artist_ids = {
+        artist_id for artist in track.get("artists") or () if (artist_id := artist.get("id"))
+    }
 
-    if seed_artist_ids and artist_ids.intersection(seed_artist_ids):
+    if seed_artist_ids and not seed_artist_ids.isdisjoint(artist_ids):
         seed_bonus = 0.2
         score += seed_bonus
         breakdown["seed_overlap"] = round(seed_bonus, 4)
     else:
         breakdown["seed_overlap"] = 0.0
 
-    if focus_artist_ids and artist_ids.intersection(focus_artist_ids):
+    if focus_artist_ids and not focus_artist_ids.isdisjoint(artist_ids):
         focus_bonus = 0.3
         score += focus_bonus
         breakdown["focus_artist"] = round(focus_bonus, 4)
@@ -1251,14 +1600,20 @@ def _score_track_basic(
     name_lower = (track.get("name") or "").lower()
     keyword_bonus = 0.0
     if prompt_keywords:
-        keyword_hits = sum(1 for kw in prompt_keywords if kw in name_lower)
-        keyword_bonus = min(keyword_hits, 2) * 0.05
+        # The bonus saturates at two distinct keywords, so stop scanning once both are found.
+        keyword_hits = 0
+        for kw in prompt_keywords:
+            if kw in name_lower:
+                keyword_hits += 1
+                if keyword_hits == 2:
+                    break
+        keyword_bonus = keyword_hits * 0.05
         score += keyword_bonus
     breakdown["keyword_match"] = round(keyword_bonus, 4)
 
     year_bonus = 0.0
     energy_bonus = 0.0
-    candidate_year = _extract_release_year(track)
+    candidate_year = release_year if release_year is not None else _extract_release_year(track)
     if seed_year_avg and candidate_year:
         year_diff = abs(candidate_year - seed_year_avg)
         year_bonus = max(0.0, (18 - year_diff) / 36.0) * 0.18
@@ -1275,37 +1630,26 @@ def _score_track_basic(
     cache_bonus = 0.0
     cache_genre_bonus = 0.0
     novelty_bonus = 0.0
-    if profile_cache:
-        track_lookup = profile_cache.get("tracks")
-        if isinstance(track_lookup, dict):
-            cached_record = track_lookup.get(track.get("id"))
-            if isinstance(cached_record, dict):
-                cache_bonus = 0.18
-                score += cache_bonus
-
-        if target_genre:
-            genre_buckets = profile_cache.get("genre_buckets")
-            if isinstance(genre_buckets, dict):
-                genre_bucket = genre_buckets.get(target_genre)
-                if isinstance(genre_bucket, dict):
-                    track_ids = genre_bucket.get("track_ids") or []
-                    if track.get("id") in track_ids:
-                        cache_genre_bonus = 0.12
-                        score += cache_genre_bonus
-
-        artist_counts = profile_cache.get("artist_counts")
-        if isinstance(artist_counts, dict) and artist_ids:
-            for artist_id in artist_ids:
-                play_count = int(artist_counts.get(artist_id, 0))
-                if play_count == 0:
-                    novelty_bonus += 0.05
-                elif play_count <= 2:
-                    novelty_bonus += 0.02
-                elif play_count >= 6:
-                    novelty_bonus -= 0.03
-                else:
-                    novelty_bonus -= 0.01
-            score += novelty_bonus
+    track_id = track.get("id")
+    if track_id in context.cached_tracks:
+        cache_bonus = 0.18
+        score += cache_bonus
+    if track_id in context.genre_track_ids:
+        cache_genre_bonus = 0.12
+        score += cache_genre_bonus
+    artist_counts = context.artist_counts
+    if artist_counts is not None and artist_ids:
+        for artist_id in artist_ids:
+            play_count = int(artist_counts.get(artist_id, 0))
+            if play_count == 0:
+                novelty_bonus += 0.05
+            elif play_count <= 2:
+                novelty_bonus += 0.02
+            elif play_count >= 6:
+                novelty_bonus -= 0.03
+            else:
+                novelty_bonus -= 0.01
+        score += novelty_bonus
 
     breakdown["cache_track_hit"] = round(cache_bonus, 4)
     breakdown["cache_genre_alignment"] = round(cache_genre_bonus, 4)
@@ -1316,6 +1660,21 @@ def _score_track_basic(
     return total, breakdown
 
 
+def _iter_by_score(
+    scored_tracks: List[tuple[float, Dict, Dict[str, float]]],
+) -> Iterator[tuple[float, Dict, Dict[str, float]]]:
+    """Yield scored tracks best-first, in the order a stable descending sort would give.
+
+    Selection stops after a handful of picks, so popping from a heap (O(N + k log N))
+    beats sorting the whole pool; the index tiebreak keeps equal scores in input order.
+    """
+    heap = [(-item[0], index) for index, item in enumerate(scored_tracks)]
+    heapq.heapify(heap)
+    while heap:
+        _, index = heapq.heappop(heap)
+        yield scored_tracks[index]
+
+
 def get_similar_tracks(
     seed_track_ids: List[str],
     seed_artist_ids: Set[str],
@@ -1336,82 +1695,99 @@ def get_similar_tracks(
         _log(debug_steps, log_step, "No seed track IDs available; skipping local recommendations.")
         return []
 
-    sp = spotipy.Spotify(auth=token)
+    sp = _spotify_client(token)
 
     normalized_genre = _normalize_genre(attributes.get("genre", "pop") or "pop")
     energy_label = attributes.get("energy")
 
-    candidate_tracks: List[Dict] = []
+    # Keyed by track id: insertion order keeps the first occurrence of each candidate.
+    unique_candidates: Dict[str, Dict] = {}
+    seed_id_set: Set[str] = set(seed_track_ids)
 
-    playlist_candidates = _discover_playlist_seeds(
-        sp,
-        normalized_genre,
-        market=market,
-        debug_steps=debug_steps,
-        log_step=log_step,
-        playlist_limit=4,
-        track_limit=40,
-    )
-    candidate_tracks.extend(playlist_candidates)
+    def _add_candidates(batch: Iterable[Dict]) -> None:
+        for track in batch:
+            track_id = track.get("id")
+            if track_id and track_id not in seed_id_set:
+                unique_candidates.setdefault(track_id, track)
+
+    # Both search queries filter by artist genre; resolve each artist once per call.
+    artist_memo: Dict[str, Dict] = {}
+    filter_non_latin = _should_filter_non_latin()
 
     search_queries = [f'genre:"{normalized_genre}" year:2015-2025']
     mood = attributes.get("mood")
     if mood:
         search_queries.append(f'"{mood}" {normalized_genre}')
 
-    for search_query in search_queries:
+    # The track searches are independent of playlist discovery, so they are in flight on
+    # this call's executor while playlists are scanned; filtering stays on this thread.
+    with _fetch_executor(len(search_queries)) as executor:
+        pending_searches = []
         search_limit = min(limit * 4, 50)
-        offset_cap = max(0, 100 - search_limit)
-        offset = random.randint(0, offset_cap) if offset_cap else 0
-        _log(
-            debug_steps,
-            log_step,
-            f"Spotify API → search tracks: q='{search_query}', limit={search_limit}, market={market}, offset={offset}",
-        )
-        try:
-            tracks = sp.search(
+        for search_query in search_queries:
+            offset = _search_offset(search_limit)
+            _log(
+                debug_steps,
+                log_step,
+                f"Spotify API → search tracks: q='{search_query}', limit={search_limit}, market={market}, offset={offset}",
+            )
+            future = executor.submit(
+                _cached_search,
+                sp,
                 q=search_query,
                 type="track",
                 limit=search_limit,
                 market=market,
                 offset=offset,
-            ).get("tracks", {}).get("items", [])
-            tracks = _filter_by_market(tracks, market)
-            tracks = _filter_tracks_by_artist_genre(
-                sp,
-                tracks,
-                normalized_genre,
-                debug_steps=debug_steps,
-                log_step=log_step,
             )
-            if _should_filter_non_latin():
-                tracks = _filter_non_latin_tracks(tracks)
-            candidate_tracks.extend(tracks)
-            sample_names = [track.get("name") for track in tracks[:5] if track.get("name")]
-            if sample_names:
-                _log(debug_steps, log_step, f"Search returned {len(tracks)} candidates for query '{search_query}'. Sample: {sample_names}")
-            else:
-                _log(debug_steps, log_step, f"Search returned {len(tracks)} candidates for query '{search_query}'.")
-        except SpotifyException as exc:
-            _log(debug_steps, log_step, f"Spotify search error for '{search_query}': {exc}.")
-        except requests.exceptions.RequestException as exc:
-            _log(debug_steps, log_step, f"Network error during Spotify search for '{search_query}': {exc}.")
+            pending_searches.append((search_query, future))
+
+        playlist_candidates = _discover_playlist_seeds(
+            sp,
+            normalized_genre,
+            market=market,
+            debug_steps=debug_steps,
+            log_step=log_step,
+            playlist_limit=4,
+            track_limit=40,
+        )
+        _add_candidates(playlist_candidates)
 
-    unique_candidates: List[Dict] = []
-    seen_ids: Set[str] = set(seed_track_ids)
-    for track in candidate_tracks:
-        track_id = track.get("id")
-        if not track_id or track_id in seen_ids:
-            continue
-        seen_ids.add(track_id)
-        unique_candidates.append(track)
+        for search_query, future in pending_searches:
+            try:
+                tracks = future.result().get("tracks", {}).get("items", [])
+                tracks = _filter_by_market(tracks, market)
+                tracks = _filter_tracks_by_artist_genre(
+                    sp,
+                    tracks,
+                    normalized_genre,
+                    debug_steps=debug_steps,
+                    log_step=log_step,
+                    artist_memo=artist_memo,
+                )
+                if filter_non_latin:
+                    tracks = _filter_non_latin_tracks(tracks)
+                _add_candidates(tracks)
+                message = f"Search returned {len(tracks)} candidates for query '{search_query}'."
+                sample_names = _sample_names(tracks)
+                if sample_names:
+                    message += f" Sample: {sample_names}"
+                _log(debug_steps, log_step, message)
+            except SpotifyException as exc:
+                _log(debug_steps, log_step, f"Spotify search error for '{search_query}': {exc}.")
+            except requests.exceptions.RequestException as exc:
+                _log(debug_steps, log_step, f"Network error during Spotify search for '{search_query}': {exc}.")
 
     _log(debug_steps, log_step, f"Local recommender candidate pool size after filtering: {len(unique_candidates)}.")
 
     scored_tracks: List[tuple[float, Dict, Dict[str, float]]] = []
-    artist_counts: Dict[str, int] = {}
+    artist_counts: Counter[str] = Counter()
 
-    for track in unique_candidates:
+    scoring_context = _scoring_context(profile_cache, normalized_genre)
+    # Parsed once here and reused when serializing, without writing to the track dicts.
+    release_years: Dict[int, Optional[int]] = {}
+    for track in unique_candidates.values():
+        release_years[id(track)] = _extract_release_year(track)
         score, breakdown = _score_track_basic(
             track,
             seed_artist_ids,
@@ -1421,42 +1797,48 @@ def get_similar_tracks(
             profile_cache=profile_cache,
             focus_artist_ids=focus_artist_ids,
             target_genre=normalized_genre,
+            context=scoring_context,
+            release_year=release_years[id(track)],
         )
         scored_tracks.append((score, track, breakdown))
 
     _log(debug_steps, log_step, f"Local recommender scored {len(scored_tracks)} candidates.")
 
-    scored_tracks.sort(key=lambda item: item[0], reverse=True)
-
     recommendations: List[Dict[str, str]] = []
-    for score, track, breakdown in scored_tracks:
+    for score, track, breakdown in _iter_by_score(scored_tracks):
         if len(recommendations) >= limit:
             break
-        artists = track.get("artists", [])
-        artist_names = [artist.get("name", "") for artist in artists]
-        if any(artist_counts.get(name, 0) >= 2 for name in artist_names if name):
+        artist_names = [
+            name for artist in track.get("artists", []) if (name := artist.get("name"))
+        ]
+        if any(artist_counts[name] >= 2 for name in artist_names):
             continue
-        artist_label = ", ".join(name for name in artist_names if name) or "Unknown"
-        serialized = _serialize_track_payload(track)
-        if artist_label and not serialized.get("artists"):
-            serialized["artists"] = artist_label
-        serialized["score"] = round(score, 4)
-        serialized["score_breakdown"] = breakdown
-        serialized["seed_artist_overlap"] = bool(seed_artist_ids and {artist.get("id") for artist in track.get("artists", []) or []}.intersection(seed_artist_ids))
+        # The serialized payload already carries the joined artist label and the artist ids,
+        # so both overlap flags reuse its id list instead of rebuilding sets from the track.
+        serialized = _serialize_track_payload(
+            track,
+            year=release_years[id(track)],
+            score=round(score, 4),
+            score_breakdown=breakdown,
+        )
+        track_artist_ids = serialized["artist_ids"]
+        serialized["seed_artist_overlap"] = bool(
+            seed_artist_ids and not seed_artist_ids.isdisjoint(track_artist_ids)
+        )
         serialized["focus_artist_overlap"] = bool(
-            focus_artist_ids and {artist.get("id") for artist in track.get("artists", []) or []}.intersection(focus_artist_ids)
+            focus_artist_ids and not focus_artist_ids.isdisjoint(track_artist_ids)
         )
         recommendations.append(serialized)
-        for name in artist_names:
-            if not name:
-                continue
-            artist_counts[name] = artist_counts.get(name, 0) + 1
+        artist_counts.update(artist_names)
 
     _log(debug_steps, log_step, f"Local recommender selected {len(recommendations)} similarity-based tracks.")
 
     return recommendations
 
 
+_TRACK_REFERENCE_PREFIXES = ("spotify:", "http://", "https://")
+
+
 def create_playlist_with_tracks(
     token: str,
     track_ids: List[str],
@@ -1477,7 +1859,7 @@ def create_playlist_with_tracks(
     if not playlist_name:
         raise ValueError("A playlist name must be provided.")
 
-    sp = spotipy.Spotify(auth=token)
+    sp = _spotify_client(token)
 
     resolved_user_display_name = user_display_name
     if not resolved_user_display_name:
@@ -1510,10 +1892,18 @@ def create_playlist_with_tracks(
     if not playlist_id:
         raise RuntimeError("Spotify did not return a playlist id.")
 
+    # Duplicates would be added twice, so dedupe (order-preserving) and build the URIs once
+    # rather than letting spotipy convert every id on each batch. URIs and open.spotify.com
+    # URLs pass through unchanged; spotipy resolves URLs itself.
+    track_uris = [
+        track_id if track_id.startswith(_TRACK_REFERENCE_PREFIXES) else f"spotify:track:{track_id}"
+        for track_id in dict.fromkeys(track_id for track_id in track_ids if track_id)
+    ]
+
     # Spotify limits each request to 100 tracks max.
     chunk_size = 100
-    for start in range(0, len(track_ids), chunk_size):
-        batch = track_ids[start : start + chunk_size]
+    for start in range(0, len(track_uris), chunk_size):
+        batch = track_uris[start : start + chunk_size]
         # Add tracks in batches to respect Spotify API limits.
         try:
             sp.playlist_add_items(playlist_id, batch)
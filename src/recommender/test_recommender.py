@@ -7,19 +7,24 @@
 # pylint: disable=too-many-arguments,too-many-positional-arguments
 # pylint: disable=import-outside-toplevel,unused-argument
 
+import functools
+import gc
 import json
+import threading
 from types import SimpleNamespace
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 from django.conf import settings
 from django.contrib.messages import get_messages
-from django.core.cache import cache
+from django.core.cache import cache, caches
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from spotipy.exceptions import SpotifyException
 
 from recommender.models import PlaylistGenerationStat, SavedPlaylist
 from recommender.services.spotify_handler import (
     _extract_release_year,
+    _fetch_artists,
     _filter_by_market,
     _filter_non_latin_tracks,
     _filter_tracks_by_artist_genre,
@@ -27,7 +32,10 @@ from recommender.services.spotify_handler import (
     _normalize_artist_key,
     _normalize_genre,
     _primary_image_url,
+    _SPOTIFY_FETCH_WORKERS,
+    _cached_search,
     _serialize_track_payload,
+    _spotify_client,
     _tracks_to_strings,
     discover_top_tracks_for_genre,
     get_similar_tracks,
@@ -35,6 +43,9 @@ from recommender.services.spotify_handler import (
     create_playlist_with_tracks,
     _score_track_basic,
     _is_mostly_latin,
+    build_user_profile_seed_snapshot,
+    cached_artist_id_for_hint,
+    cached_tracks_for_artist,
     compute_playlist_statistics,
 )
 from recommender.services.stats_service import (
@@ -46,15 +57,26 @@ from recommender.services.user_preferences import (
     get_default_preferences,
 )
 from recommender.services.llm_handler import (
-    _json_candidates,
-    _parse_json_response,
+    _CLIENT_STATE,
+    _INFLIGHT,
+    _get_openai_client,
     dispatch_llm_query,
     extract_playlist_attributes,
+    plan_playlist,
     query_openai,
     refine_playlist,
     suggest_remix_tracks,
     suggest_seed_tracks,
 )
+from recommender.services.llm_json import (
+    _coerce_track_list,
+    _json_array_closed,
+    _json_candidates,
+    _parse_json_response,
+    _track_array_limit_reached,
+)
+from recommender.services.llm_streaming import get_llm_usage_snapshot, reset_llm_usage_tracker
+from recommender.services.session_utils import remember_spotify_user_id, resolve_request_user_id
 from recommender.views import _cache_key, _build_context_from_payload, _make_logger
 
 
@@ -264,7 +286,7 @@ class GeneratePlaylistViewTests(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, reverse("spotify_auth:login"))
 
-    @patch("recommender.views.extract_playlist_attributes")
+    @patch("recommender.views.plan_playlist")
     @patch("recommender.views.compute_playlist_statistics")
     @patch("recommender.views.suggest_seed_tracks")
     @patch("recommender.views.resolve_seed_tracks")
@@ -277,14 +299,14 @@ class GeneratePlaylistViewTests(TestCase):
         mock_resolve,
         mock_suggest,
         mock_stats,
-        mock_extract,
+        mock_plan,
     ):
         session = self.client.session
         session["spotify_access_token"] = "token"
         session["spotify_user_id"] = "user123"
         session.save()
 
-        mock_extract.return_value = {"mood": "upbeat", "genre": "pop", "energy": "high"}
+        mock_plan.return_value = ({"mood": "upbeat", "genre": "pop", "energy": "high"}, [])
         mock_stats.return_value = {
             "total_tracks": 3,
             "total_duration": "00:09:15",
@@ -329,7 +351,7 @@ class GeneratePlaylistViewTests(TestCase):
         response = self.client.post(self.url, {"prompt": "high energy pop"})
 
         self.assertEqual(response.status_code, 200)
-        mock_extract.assert_called_once()
+        mock_plan.assert_called_once()
         mock_suggest.assert_called_once()
         mock_resolve.assert_called_once()
         mock_similar.assert_called_once()
@@ -349,7 +371,7 @@ class GeneratePlaylistViewTests(TestCase):
         self.assertIn('Show All Genres', page)
         self.assertIn('Source Blend', page)
 
-    @patch("recommender.views.extract_playlist_attributes")
+    @patch("recommender.views.plan_playlist")
     @patch("recommender.views.compute_playlist_statistics")
     @patch("recommender.views.suggest_seed_tracks")
     @patch("recommender.views.resolve_seed_tracks")
@@ -364,14 +386,14 @@ class GeneratePlaylistViewTests(TestCase):
         mock_resolve,
         mock_suggest,
         mock_stats,
-        mock_extract,
+        mock_plan,
     ):
         session = self.client.session
         session["spotify_access_token"] = "token"
         session["spotify_user_id"] = "user123"
         session.save()
 
-        mock_extract.return_value = {"genre": "pop"}
+        mock_plan.return_value = ({"genre": "pop"}, [])
         mock_stats.return_value = {"genre_top": []}
         mock_suggest.return_value = []
         mock_resolve.return_value = []
@@ -401,7 +423,7 @@ class GeneratePlaylistViewTests(TestCase):
         focus_ids = kwargs.get("focus_artist_ids")
         self.assertIn("artist-123", focus_ids)
 
-    @patch("recommender.views.extract_playlist_attributes")
+    @patch("recommender.views.plan_playlist")
     @patch("recommender.views.compute_playlist_statistics")
     @patch("recommender.views.suggest_seed_tracks")
     @patch("recommender.views.resolve_seed_tracks")
@@ -414,13 +436,13 @@ class GeneratePlaylistViewTests(TestCase):
         mock_resolve,
         mock_suggest,
         mock_stats,
-        mock_extract,
+        mock_plan,
     ):
         session = self.client.session
         session["spotify_access_token"] = "token"
         session.save()
 
-        mock_extract.return_value = {"mood": "calm", "genre": "ambient", "energy": "low"}
+        mock_plan.return_value = ({"mood": "calm", "genre": "ambient", "energy": "low"}, [])
         mock_stats.return_value = {
             "total_tracks": 2,
             "total_duration": "00:08:00",
@@ -460,7 +482,7 @@ class GeneratePlaylistViewTests(TestCase):
         response = self.client.post(self.url, {"prompt": "calming ambient"})
 
         self.assertEqual(response.status_code, 200)
-        mock_extract.assert_called_once()
+        mock_plan.assert_called_once()
         mock_suggest.assert_called_once()
         mock_resolve.assert_called_once()
         mock_discover.assert_called_once()
@@ -474,7 +496,7 @@ class GeneratePlaylistViewTests(TestCase):
         self.assertIn('Least Popular', page)
         self.assertIn('Show All Genres', page)
 
-    @patch("recommender.views.extract_playlist_attributes")
+    @patch("recommender.views.plan_playlist")
     @patch("recommender.views.suggest_seed_tracks")
     @patch("recommender.views.resolve_seed_tracks")
     @patch("recommender.views.get_similar_tracks")
@@ -485,7 +507,7 @@ class GeneratePlaylistViewTests(TestCase):
         mock_similar,
         mock_resolve,
         mock_suggest,
-        mock_extract,
+        mock_plan,
     ):
         session = self.client.session
         session["spotify_access_token"] = "token"
@@ -520,7 +542,7 @@ class GeneratePlaylistViewTests(TestCase):
         page = response.content.decode()
         self.assertIn('class="track-name">Cached Song', page)
         self.assertIn('class="track-artist">Artist', page)
-        mock_extract.assert_not_called()
+        mock_plan.assert_not_called()
         mock_suggest.assert_not_called()
         mock_resolve.assert_not_called()
         mock_similar.assert_not_called()
@@ -607,7 +629,7 @@ class RemixPlaylistViewTests(TestCase):
         self.url = reverse("recommender:remix_playlist")
         cache.clear()
 
-    def _seed_cached_playlist(self, cache_key: str, track_count: int = 3):
+    def _seed_cached_playlist(self, cache_key: str, track_count: int = 3, attributes=None):
         session = self.client.session
         if not session.session_key:
             session.save()
@@ -639,7 +661,7 @@ class RemixPlaylistViewTests(TestCase):
                     "track_details": tracks,
                     "track_ids": [entry["id"] for entry in tracks],
                     "prompt": "lofi coding mix",
-                    "attributes": {"mood": "chill", "genre": "lo-fi", "energy": "low"},
+                    "attributes": attributes or {"mood": "chill", "genre": "lo-fi", "energy": "low"},
                     "suggested_playlist_name": "Lofi Coding Mix",
                 },
             ),
@@ -737,6 +759,38 @@ class RemixPlaylistViewTests(TestCase):
         self.assertIn('Show All Genres', content)
         self.assertIn('Source Blend', content)
 
+    @patch("recommender.views.compute_playlist_statistics", return_value={})
+    @patch("recommender.views.get_similar_tracks", return_value=[])
+    @patch("recommender.views.resolve_seed_tracks", return_value=[])
+    @patch("recommender.views.suggest_remix_tracks", return_value=[])
+    @patch("recommender.services.llm_handler.dispatch_llm_query", return_value="not json")
+    def test_remix_merges_fallback_attributes_as_lists(
+        self,
+        mock_dispatch,
+        mock_suggest,
+        mock_resolve,
+        mock_similar,
+        mock_stats,
+    ):
+        session = self.client.session
+        session["spotify_access_token"] = "token"
+        session["spotify_user_id"] = "remix-user"
+        session.save()
+        cache_key = _cache_key("remix-user", "lofi coding mix")
+
+        for cached_artists, expected in ((["Drake"], ["Drake"]), ([], [])):
+            self._seed_cached_playlist(
+                cache_key,
+                attributes={"mood": "chill", "genre": "lo-fi", "energy": "low", "artists": cached_artists},
+            )
+            response = self.client.post(self.url, {"cache_key": cache_key, "prompt": "more like this"})
+
+            self.assertEqual(response.status_code, 200)
+            merged = mock_suggest.call_args.args[1]
+            self.assertEqual(merged["artists"], expected)
+            self.assertIsInstance(merged["artists"], list)
+        self.assertEqual(mock_dispatch.call_count, 2)
+
     def test_remix_requires_spotify_auth(self):
         cache_key = _cache_key("remix-user", "lofi coding mix")
         self._seed_cached_playlist(cache_key)
@@ -750,6 +804,37 @@ class RemixPlaylistViewTests(TestCase):
 class SpotifyHandlerTests(TestCase):
     """Unit tests for Spotify service helpers."""
 
+    def setUp(self):
+        cache.clear()
+        caches[settings.RECOMMENDER_LOOKUP_CACHE_ALIAS].clear()
+
+    def test_search_results_are_cached_per_query(self):
+        sp = MagicMock()
+        sp.search.return_value = {"tracks": {"items": [{"id": "track-1"}]}}
+
+        first = _cached_search(sp, q="lofi", type="track", limit=5, market="US")
+        # Search results live in the lookup cache, apart from playlist payloads.
+        cache.clear()
+        second = _cached_search(sp, market="US", limit=5, type="track", q="lofi")
+        _cached_search(sp, q="lofi", type="track", limit=5)
+
+        self.assertEqual(first, second)
+        self.assertEqual(sp.search.call_count, 2)
+
+    @patch("recommender.services.spotify_handler.spotipy.Spotify")
+    def test_artist_lookups_are_cached_between_calls(self, mock_spotify):
+        mock_instance = mock_spotify.return_value
+        mock_instance.artists.return_value = {
+            "artists": [{"id": "artist-1", "genres": ["Pop"]}]
+        }
+        tracks = [{"id": "track-1", "duration_ms": 1000, "artist_ids": ["artist-1"]}]
+
+        first = compute_playlist_statistics("token", tracks)
+        second = compute_playlist_statistics("token", tracks)
+
+        self.assertEqual(first["genre_distribution"], second["genre_distribution"])
+        mock_instance.artists.assert_called_once_with(["artist-1"])
+
     def test_compute_playlist_statistics_empty_playlist(self):
         stats = compute_playlist_statistics("token", [])
 
@@ -897,6 +982,28 @@ class SpotifyHandlerTests(TestCase):
         self.assertEqual(results[0]["album_image_url"], "http://example.com/art.jpg")
         self.assertEqual(results[0]["duration_ms"], 210000)
 
+    @patch("recommender.services.spotify_handler.spotipy.Spotify")
+    def test_resolve_seed_tracks_refills_missing_slots_in_order(self, mock_spotify):
+        def fake_search(q, **kwargs):
+            if "Missing" in q:
+                return {"tracks": {"items": []}}
+            title = q.split('"')[1]
+            return {"tracks": {"items": [{"id": title, "name": title, "artists": []}]}}
+
+        mock_spotify.return_value.search.side_effect = fake_search
+        suggestions = [
+            {"title": "First", "artist": "A"},
+            {"title": "Missing", "artist": "B"},
+            {"title": "Second", "artist": "C"},
+            {"title": "Third", "artist": "D"},
+        ]
+
+        results = resolve_seed_tracks(suggestions, token="token", limit=2)
+
+        self.assertEqual([track["id"] for track in results], ["First", "Second"])
+        searched = {call.kwargs["q"] for call in mock_spotify.return_value.search.call_args_list}
+        self.assertFalse(any("Third" in query for query in searched))
+
     @patch("recommender.services.spotify_handler.spotipy.Spotify")
     def test_discover_top_tracks_for_genre(self, mock_spotify):
         mock_instance = mock_spotify.return_value
@@ -1070,9 +1177,44 @@ class SpotifyHandlerTests(TestCase):
         mock_instance.current_user.assert_called()
         mock_instance.playlist_add_items.assert_called_once()
         self.assertEqual(mock_instance.playlist_add_items.call_args.args[0], "playlist456")
-        self.assertEqual(mock_instance.playlist_add_items.call_args.args[1], ["track1"])
+        self.assertEqual(mock_instance.playlist_add_items.call_args.args[1], ["spotify:track:track1"])
         self.assertEqual(result["user_id"], "preset-user")
 
+    @patch("recommender.services.spotify_handler.spotipy.Spotify")
+    def test_create_playlist_with_tracks_dedupes_ids(self, mock_spotify):
+        mock_instance = mock_spotify.return_value
+        mock_instance.user_playlist_create.return_value = {"id": "playlist789"}
+
+        create_playlist_with_tracks(
+            token="token",
+            track_ids=["track1", "track2", "track1", "", "spotify:track:track3"],
+            playlist_name="Daily Mix",
+            user_id="preset-user",
+            user_display_name="User Name",
+        )
+
+        mock_instance.playlist_add_items.assert_called_once_with(
+            "playlist789",
+            ["spotify:track:track1", "spotify:track:track2", "spotify:track:track3"],
+        )
+
+    @patch("recommender.services.spotify_handler.spotipy.Spotify")
+    def test_create_playlist_with_tracks_keeps_track_urls(self, mock_spotify):
+        mock_instance = mock_spotify.return_value
+        mock_instance.user_playlist_create.return_value = {"id": "playlist789"}
+        track_url = "https://open.spotify.com/track/4uLU6hMCjMI75M1A2tKUQC?si=abc"
+
+        create_playlist_with_tracks(
+            token="token",
+            track_ids=[track_url, "track1"],
+            playlist_name="Daily Mix",
+            user_id="preset-user",
+        )
+
+        mock_instance.playlist_add_items.assert_called_once_with(
+            "playlist789", [track_url, "spotify:track:track1"]
+        )
+
     def test_create_playlist_with_tracks_requires_tracks(self):
         with self.assertRaises(ValueError):
             create_playlist_with_tracks(token="token", track_ids=[], playlist_name="Empty")
@@ -1081,6 +1223,10 @@ class SpotifyHandlerTests(TestCase):
 class SpotifyUtilityFunctionTests(TestCase):
     """Coverage for low-level Spotify helper functions."""
 
+    def setUp(self):
+        cache.clear()
+        caches[settings.RECOMMENDER_LOOKUP_CACHE_ALIAS].clear()
+
     def test_normalize_helpers_handle_unicode(self):
         self.assertEqual(_normalize_genre("Lo-Fi ✨ Beats"), "lo-fi--beats")
         self.assertEqual(_normalize_artist_key("HΔppen!ng Artist"), "hppenngartist")
@@ -1129,10 +1275,156 @@ class SpotifyUtilityFunctionTests(TestCase):
         filtered = _filter_tracks_by_artist_genre(DummySpotify(), tracks, "synth-pop", popularity_threshold=60)
         self.assertEqual([track["id"] for track in filtered], ["track1"])
 
+    def test_filter_tracks_by_artist_genre_matches_short_alias_substrings(self):
+        class DummySpotify:
+            def artists(self, ids):
+                return {
+                    "artists": [
+                        {"id": "artist1", "genres": ["Alternative RB"]},
+                        {"id": "artist2", "genres": ["Jazz"]},
+                    ]
+                }
+
+        tracks = [
+            {"id": "track1", "artists": [{"id": "artist1"}], "popularity": 65},
+            {"id": "track2", "artists": [{"id": "artist2"}], "popularity": 70},
+            {"id": "track3", "artists": [{"id": "artist1"}], "popularity": 10},
+        ]
+        filtered = _filter_tracks_by_artist_genre(DummySpotify(), tracks, "r-b", popularity_threshold=60)
+        self.assertEqual([track["id"] for track in filtered], ["track1"])
+
+    def test_seed_snapshot_indexes_tracks_by_artist(self):
+        tracks = [
+            {
+                "id": f"track{index}",
+                "name": f"Song {index}",
+                "artists": [{"id": "artist1", "name": "Artist One"}],
+                "album": {"release_date": "2020-01-01"},
+                "popularity": popularity,
+            }
+            for index, popularity in enumerate([40, 90, 65])
+        ]
+
+        class DummySpotify:
+            def current_user_top_tracks(self, **kwargs):
+                return {"items": tracks}
+
+            def artists(self, ids):
+                return {"artists": [{"id": "artist1", "name": "Artist One", "genres": ["Pop"]}]}
+
+        snapshot = build_user_profile_seed_snapshot(DummySpotify())
+
+        self.assertEqual(snapshot["artist_tracks"]["artist1"], ["track1", "track2", "track0"])
+        cached = cached_tracks_for_artist(snapshot, "artist1", limit=2)
+        self.assertEqual([track["id"] for track in cached], ["track1", "track2"])
+
+        legacy = dict(snapshot)
+        del legacy["artist_tracks"]
+        self.assertEqual(cached_tracks_for_artist(legacy, "artist1", limit=2), cached)
+
+    def test_cached_artist_id_for_hint_keeps_snapshot_order(self):
+        artists = [
+            {"id": "parks", "name": "The National Parks"},
+            {"id": "national", "name": "The National"},
+        ]
+        tracks = [
+            {
+                "id": f"track-{artist['id']}",
+                "name": f"Song by {artist['name']}",
+                "artists": [artist],
+                "album": {"release_date": "2020-01-01"},
+                "popularity": 50,
+            }
+            for artist in artists
+        ]
+
+        class DummySpotify:
+            def current_user_top_tracks(self, **kwargs):
+                return {"items": tracks}
+
+            def artists(self, ids):
+                return {"artists": [dict(artist, genres=["indie"]) for artist in artists]}
+
+        snapshot = build_user_profile_seed_snapshot(DummySpotify())
+        self.assertEqual(cached_artist_id_for_hint(snapshot, "The National"), "national")
+        # A partial hint resolves to the first containing name in snapshot order.
+        self.assertEqual(cached_artist_id_for_hint(snapshot, "National"), "parks")
+        legacy = dict(snapshot)
+        del legacy["artist_name_keys"]
+        self.assertEqual(cached_artist_id_for_hint(legacy, "National"), "parks")
+        self.assertIsNone(cached_artist_id_for_hint(snapshot, "Radiohead"))
+
+    def test_spotify_clients_share_pooled_session(self):
+        first = _spotify_client("token-a")
+        second = _spotify_client("token-b")
+
+        self.assertIs(first._session, second._session)
+        adapter = first._session.get_adapter("https://api.spotify.com/v1/")
+        self.assertEqual(
+            adapter._pool_maxsize,
+            settings.RECOMMENDER_SPOTIFY_REQUEST_THREADS * (_SPOTIFY_FETCH_WORKERS + 1),
+        )
+        self.assertEqual(adapter.max_retries.total, 3)
+
+    def test_dropped_spotify_client_keeps_shared_pools(self):
+        client = _spotify_client("token-a")
+        adapter = client._session.get_adapter("https://api.spotify.com/v1/")
+        pool = adapter.poolmanager.connection_from_url("https://api.spotify.com")
+
+        del client
+        gc.collect()
+
+        self.assertIs(
+            adapter.poolmanager.connection_from_url("https://api.spotify.com"), pool
+        )
+        self.assertEqual(pool.pool.maxsize, adapter._pool_maxsize)
+        self.assertIs(_spotify_client("token-b")._session.get_adapter("https://"), adapter)
+
+    def test_fetch_artists_serves_repeat_ids_from_memo(self):
+        sp = MagicMock()
+        sp.artists.return_value = {"artists": [{"id": "artist1", "genres": ["pop"]}]}
+        memo = {}
+
+        first = _fetch_artists(sp, ["artist1"], memo=memo)
+        self.assertIn("spotify:artist:artist1", caches[settings.RECOMMENDER_LOOKUP_CACHE_ALIAS])
+        self.assertNotIn("spotify:artist:artist1", cache)
+        with patch("recommender.services.spotify_handler._lookup_cache") as mock_lookup_cache:
+            mock_cache = mock_lookup_cache.return_value
+            second = _fetch_artists(sp, ["artist1"], memo=memo)
+
+        self.assertEqual(first, second)
+        mock_cache.get_many.assert_not_called()
+        sp.artists.assert_called_once_with(["artist1"])
+
+    def test_fetch_artists_logs_batch_failures_on_calling_thread(self):
+        def artists(batch):
+            if batch[0] == "a0":
+                raise SpotifyException(500, -1, "boom")
+            return {"artists": [{"id": artist_id} for artist_id in batch]}
+
+        sp = MagicMock()
+        sp.artists.side_effect = artists
+        logged = []
+
+        fetched = _fetch_artists(
+            sp,
+            [f"a{index}" for index in range(60)],
+            log_step=lambda message: logged.append((message, threading.current_thread())),
+        )
+
+        self.assertEqual(sorted(fetched), sorted(f"a{index}" for index in range(50, 60)))
+        self.assertEqual(len(logged), 1)
+        message, thread = logged[0]
+        self.assertTrue(message.startswith("Failed to fetch artist metadata:"))
+        self.assertIs(thread, threading.current_thread())
+
     def test_release_year_and_primary_image_extraction(self):
         track = {"album": {"release_date": "2019-10-31"}}
         self.assertEqual(_extract_release_year(track), 2019)
         self.assertIsNone(_extract_release_year({"album": {"release_date": "unknown"}}))
+        self.assertEqual(track, {"album": {"release_date": "2019-10-31"}})
+        track["album"]["release_date"] = "1999"
+        self.assertEqual(_extract_release_year(track), 1999)
         images = [{"url": ""}, {"url": "http://example.com/img.jpg"}]
         self.assertEqual(_primary_image_url(images), "http://example.com/img.jpg")
         self.assertEqual(_primary_image_url([]), "")
@@ -1237,6 +1529,7 @@ class LLMHandlerTests(TestCase):
         self.assertEqual(attributes["genre"], "country")
         self.assertEqual(attributes["energy"], "medium")
         mock_query.assert_called_once()
+        self.assertEqual(mock_query.call_args.kwargs["model"], settings.RECOMMENDER_OPENAI_ATTRIBUTE_MODEL)
 
     @patch(
         "recommender.services.llm_handler.dispatch_llm_query",
@@ -1244,6 +1537,7 @@ class LLMHandlerTests(TestCase):
             "Here’s a JSON array of country classics that fit the requested attributes:\n"
             "```json\n"
             '[{"title": "Take Me Home, Country Roads", "artist": "John Denver"},'
+            '{"title": "take me home, country roads", "artist": "John Denver "},'
             '{"title": "Jolene", "artist": "Dolly Parton"}]\n'
             "```"
         ),
@@ -1273,7 +1567,7 @@ class LLMHandlerTests(TestCase):
 
     @patch(
         "recommender.services.llm_handler.dispatch_llm_query",
-        return_value="New Track - Artist\nSong A - Artist A\n",
+        return_value="New Track - Artist\nSong A - Artist A\nsong a - artist a\nNEW TRACK - ARTIST\n",
     )
     def test_refine_playlist_appends_unique_suggestions(self, mock_query):
         seeds = ["Song A - Artist A"]
@@ -1291,6 +1585,68 @@ class LLMHandlerTests(TestCase):
         self.assertTrue(suggestions)
         self.assertEqual(suggestions[0]["title"], "Blinding Lights")
 
+    @patch("recommender.services.llm_handler.dispatch_llm_query", return_value="")
+    def test_suggest_seed_tracks_fallback_normalizes_genre_separators(self, mock_query):
+        suggestions = suggest_seed_tracks("Rap", {"genre": "Hip_Hop"}, max_suggestions=2)
+        self.assertEqual([item["title"] for item in suggestions], ["SICKO MODE", "Lose Yourself"])
+        aliased = suggest_seed_tracks("Rave", {"genre": "EDM"}, max_suggestions=1)
+        aliased[0]["title"] = "Mutated"
+        self.assertNotEqual(suggest_seed_tracks("Rave", {"genre": "edm"})[0]["title"], "Mutated")
+
+    @patch("recommender.services.llm_handler.dispatch_llm_query", return_value="")
+    def test_extract_playlist_attributes_keyword_shortcut_skips_llm(self, mock_query):
+        attributes, seeds = plan_playlist("Make me a high-energy hip-hop party mix", 5)
+        self.assertEqual(
+            attributes,
+            {"mood": "party", "genre": "hip hop", "energy": "high", "artist": "", "artists": []},
+        )
+        self.assertEqual(seeds, [])
+        mock_query.assert_not_called()
+
+        extract_playlist_attributes("chill pop like Taylor Swift")
+        mock_query.assert_called_once()
+
+    @patch("recommender.services.llm_handler.dispatch_llm_query", side_effect=["", "not json", "not json"])
+    def test_extract_playlist_attributes_misses_return_fresh_defaults(self, mock_query):
+        empty = extract_playlist_attributes("anything")
+        unparsed = extract_playlist_attributes("anything")
+        self.assertEqual(empty, {"mood": "chill", "genre": "pop", "energy": "medium"})
+        self.assertEqual(unparsed["artist"], "")
+        self.assertEqual(unparsed["artists"], [])
+        empty["genre"] = "rock"
+        unparsed["artists"].append("Drake")
+        self.assertEqual(extract_playlist_attributes("anything")["artists"], [])
+        from recommender.services.llm_handler import DEFAULT_ATTRIBUTES
+        self.assertEqual(DEFAULT_ATTRIBUTES["genre"], "pop")
+
+    @patch("recommender.services.llm_handler.dispatch_llm_query")
+    def test_plan_playlist_returns_seed_suggestions(self, mock_query):
+        mock_query.return_value = json.dumps(
+            {
+                "attributes": {"mood": "sunny", "genre": "surf rock", "energy": "high"},
+                "seeds": [
+                    {"title": "Surfin' U.S.A.", "artist": "The Beach Boys"},
+                    {"title": "Misirlou", "artist": "Dick Dale"},
+                ],
+            }
+        )
+        attributes, seeds = plan_playlist("beach day", 2)
+        self.assertEqual(attributes["genre"], "surf rock")
+        self.assertEqual(seeds, [("Surfin' U.S.A.", "The Beach Boys"), ("Misirlou", "Dick Dale")])
+        self.assertIn("at most 2 objects", mock_query.call_args.args[0])
+        self.assertIsNone(mock_query.call_args.kwargs["model"])
+
+        suggestions = suggest_seed_tracks(
+            "beach day", attributes, max_suggestions=2, prefetched=seeds
+        )
+        self.assertEqual([item["title"] for item in suggestions], ["Surfin' U.S.A.", "Misirlou"])
+        mock_query.assert_called_once()
+
+        # Seeds are only reused when handed over explicitly.
+        mock_query.return_value = "[]"
+        suggest_seed_tracks("beach day", attributes, max_suggestions=2)
+        self.assertEqual(mock_query.call_count, 2)
+
     def test_json_candidates_extracts_code_fences(self):
         raw = "Intro\n```json\n{\"title\": \"Song\"}\n```\nTrailing text"
         candidates = _json_candidates(raw)
@@ -1303,7 +1659,54 @@ class LLMHandlerTests(TestCase):
         self.assertIsInstance(parsed, dict)
         self.assertEqual(parsed["tracks"], [1, 2])
 
-    @patch("recommender.services.llm_handler.query_openai", return_value="openai-response")
+    def test_coerce_track_list_normalizes_wrapped_payloads(self):
+        parsed = {"songs": [{"song": "Track", "artists": ["A", "B"]}, "Other - Artist C", {"artist": "No Title"}]}
+        self.assertEqual(
+            list(_coerce_track_list(parsed, "")),
+            [("Track", "A, B"), ("Other", "Artist C")],
+        )
+        raw = "Intro line\nSong One - Artist A\nBare Title"
+        self.assertEqual(list(_coerce_track_list(None, raw)), [("Song One", "Artist A")])
+        self.assertEqual(
+            list(_coerce_track_list(None, raw, keep_bare_lines=True)),
+            [("Intro line", ""), ("Song One", "Artist A"), ("Bare Title", "")],
+        )
+
+    def test_parse_json_response_ignores_braces_inside_strings(self):
+        payload = 'Intro {"title": "Brace } inside", "tags": ["a"]} trailing'
+        self.assertEqual(_parse_json_response(payload), {"title": "Brace } inside", "tags": ["a"]})
+
+    def test_parse_json_response_tolerates_trailing_commas(self):
+        payload = '```json\n[{"title": "Song", "artist": "Band",},]\n```'
+        self.assertEqual(_parse_json_response(payload), [{"title": "Song", "artist": "Band"}])
+
+    @patch(
+        "recommender.services.llm_handler._query_openai",
+        side_effect=[("first", True), ("second", True), ("third", True)],
+    )
+    def test_dispatch_llm_query_caches_responses_by_request(self, mock_openai):
+        lookup_cache = caches[settings.RECOMMENDER_LOOKUP_CACHE_ALIAS]
+        lookup_cache.clear()
+        self.assertEqual(dispatch_llm_query("cached prompt"), "first")
+        # Responses live in the lookup cache, apart from playlist payloads.
+        cache.clear()
+        self.assertEqual(dispatch_llm_query("cached prompt"), "first")
+        self.assertEqual(dispatch_llm_query("cached prompt", model="other"), "second")
+        with override_settings(RECOMMENDER_LLM_CACHE_SECONDS=0):
+            self.assertEqual(dispatch_llm_query("cached prompt"), "third")
+        self.assertEqual(mock_openai.call_count, 3)
+
+        mock_openai.side_effect = [("two", True), ("three", True)]
+        for limit in (2, 3):
+            stop = functools.partial(_track_array_limit_reached, limit)
+            dispatch_llm_query("capped prompt", stop_on=stop, stop_label=f"limit:{limit}")
+        self.assertEqual(
+            dispatch_llm_query("capped prompt", stop_on=stop, stop_label="limit:3"), "three"
+        )
+        self.assertEqual(mock_openai.call_count, 5)
+        lookup_cache.clear()
+
+    @patch("recommender.services.llm_handler._query_openai", return_value=("openai-response", True))
     def test_dispatch_llm_query_always_routes_to_openai(self, mock_openai):
         result = dispatch_llm_query("prompt", provider="legacy", model="tiny", timeout=15)
         self.assertEqual(result, "openai-response")
@@ -1312,8 +1715,104 @@ class LLMHandlerTests(TestCase):
             model="tiny",
             temperature=None,
             max_output_tokens=None,
+            stop_on=None,
+            response_format=None,
         )
 
+    def test_dispatch_llm_query_coalesces_identical_inflight_prompts(self):
+        started = threading.Event()
+        release = threading.Event()
+        follower_waiting = threading.Event()
+        calls = []
+        results = []
+
+        def slow_query(prompt, **kwargs):
+            calls.append(prompt)
+            started.set()
+            release.wait(5)
+            return "shared", True
+
+        with patch("recommender.services.llm_handler._query_openai", side_effect=slow_query):
+            leader = threading.Thread(target=lambda: results.append(dispatch_llm_query("same prompt")))
+            leader.start()
+            self.assertTrue(started.wait(5))
+
+            pending = next(iter(_INFLIGHT.values()))
+            original_result = pending.result
+
+            def tracked_result(timeout=None):
+                follower_waiting.set()
+                return original_result(timeout)
+
+            pending.result = tracked_result
+            follower = threading.Thread(target=lambda: results.append(dispatch_llm_query("same prompt")))
+            follower.start()
+            self.assertTrue(follower_waiting.wait(5))
+            release.set()
+            leader.join(5)
+            follower.join(5)
+
+        self.assertEqual(calls, ["same prompt"])
+        self.assertEqual(results, ["shared", "shared"])
+        self.assertEqual(_INFLIGHT, {})
+
+    def test_dispatch_llm_query_does_not_share_cut_off_responses(self):
+        started = threading.Event()
+        release = threading.Event()
+        follower_waiting = threading.Event()
+        outcomes = [('["A - B", "C', False), ('["A - B", "C - D"]', True)]
+        results = []
+
+        def query(prompt, **kwargs):
+            if len(outcomes) == 2:
+                started.set()
+                release.wait(5)
+            return outcomes.pop(0)
+
+        lookup_cache = caches[settings.RECOMMENDER_LOOKUP_CACHE_ALIAS]
+        lookup_cache.clear()
+        with patch("recommender.services.llm_handler._query_openai", side_effect=query):
+            leader = threading.Thread(target=lambda: results.append(dispatch_llm_query("cut prompt")))
+            leader.start()
+            self.assertTrue(started.wait(5))
+
+            pending = next(iter(_INFLIGHT.values()))
+            original_result = pending.result
+
+            def tracked_result(timeout=None):
+                follower_waiting.set()
+                return original_result(timeout)
+
+            pending.result = tracked_result
+            follower = threading.Thread(target=lambda: results.append(dispatch_llm_query("cut prompt")))
+            follower.start()
+            self.assertTrue(follower_waiting.wait(5))
+            release.set()
+            leader.join(5)
+            follower.join(5)
+
+        # The follower queried on its own, and the cut-off text was never cached.
+        self.assertEqual(results, ['["A - B", "C', '["A - B", "C - D"]'])
+        with patch(
+            "recommender.services.llm_handler._query_openai", return_value=("fresh", True)
+        ) as mock_openai:
+            self.assertEqual(dispatch_llm_query("cut prompt"), "fresh")
+        mock_openai.assert_called_once()
+        lookup_cache.clear()
+
+    @override_settings(OPENAI_API_KEY="test-key")
+    @patch("openai.DefaultHttpxClient")
+    @patch("openai.OpenAI")
+    def test_get_openai_client_reuses_pooled_keepalive_transport(self, mock_openai, mock_http):
+        with patch.dict(_CLIENT_STATE, {"client": None}):
+            first = _get_openai_client()
+            second = _get_openai_client()
+
+        self.assertIs(first, second)
+        mock_openai.assert_called_once()
+        self.assertIs(mock_openai.call_args.kwargs["http_client"], mock_http.return_value)
+        self.assertEqual(mock_http.call_args.kwargs["limits"].keepalive_expiry, 120.0)
+
     @patch("recommender.services.llm_handler._get_openai_client")
     def test_query_openai_returns_output_text(self, mock_get_client):
         class DummyResponses:
@@ -1325,6 +1824,106 @@ class LLMHandlerTests(TestCase):
         self.assertEqual(output, "final answer")
         mock_get_client.assert_called_once()
 
+    @patch("recommender.services.llm_handler._get_openai_client")
+    def test_query_openai_forwards_json_response_format(self, mock_get_client):
+        captured = {}
+
+        class DummyResponses:
+            def create(self, **kwargs):
+                captured.update(kwargs)
+                return SimpleNamespace(output_text='{"mood": "calm"}')
+
+        mock_get_client.return_value = SimpleNamespace(responses=DummyResponses())
+        query_openai("Reply in JSON", response_format={"type": "json_object"})
+        self.assertEqual(captured["text"], {"format": {"type": "json_object"}})
+
+    @patch("recommender.services.llm_handler._get_openai_client")
+    def test_query_openai_stream_retries_timeouts_with_longer_budget(self, mock_get_client):
+        import httpx
+        from openai import APITimeoutError
+
+        request = httpx.Request("POST", "https://api.openai.com/v1/responses")
+        late_answer = [SimpleNamespace(type="response.output_text.delta", delta="late answer")]
+        outcomes = [APITimeoutError(request=request), iter(late_answer)]
+        attempts = []
+
+        class DummyResponses:
+            def __init__(self, max_retries):
+                self.max_retries = max_retries
+
+            def create(self, **kwargs):
+                attempts.append((kwargs.get("timeout"), self.max_retries))
+                outcome = outcomes.pop(0)
+                if isinstance(outcome, Exception):
+                    raise outcome
+                return outcome
+
+        class DummyClient:
+            def __init__(self, max_retries=None):
+                self.responses = DummyResponses(max_retries)
+
+            def with_options(self, **options):
+                return DummyClient(**options)
+
+        mock_get_client.return_value = DummyClient()
+        self.assertEqual(query_openai("prompt", stop_on=lambda text: False), "late answer")
+        self.assertEqual(
+            [(timeout.read, retries) for timeout, retries in attempts],
+            [(8.0, 0), (20.0, None)],
+        )
+
+        # Full generations get one attempt with the longer budget and the SDK's retries.
+        outcomes[:] = [SimpleNamespace(output_text="full answer")]
+        attempts.clear()
+        self.assertEqual(query_openai("prompt"), "full answer")
+        self.assertEqual(
+            [(timeout.read, retries) for timeout, retries in attempts], [(20.0, None)]
+        )
+
+    @patch("recommender.services.llm_handler._get_openai_client")
+    def test_query_openai_reopens_stream_that_stalls_mid_response(self, mock_get_client):
+        import httpx
+
+        def stalled_stream():
+            yield SimpleNamespace(type="response.output_text.delta", delta='["A - B", "C')
+            raise httpx.ReadTimeout("stalled")
+
+        complete_stream = [
+            SimpleNamespace(type="response.output_text.delta", delta='["A - B", "C - D"]'),
+            SimpleNamespace(type="response.completed", response=SimpleNamespace(usage=None)),
+        ]
+        outcomes = [stalled_stream(), iter(complete_stream)]
+        timeouts = []
+
+        class DummyResponses:
+            def create(self, **kwargs):
+                timeouts.append(kwargs["timeout"].read)
+                return outcomes.pop(0)
+
+        client = SimpleNamespace(responses=DummyResponses())
+        client.with_options = lambda **_options: client
+        mock_get_client.return_value = client
+        output = query_openai("prompt", stop_on=lambda text: False)
+        self.assertEqual(output, '["A - B", "C - D"]')
+        self.assertEqual(timeouts, [8.0, 20.0])
+
+    @patch("recommender.services.llm_handler._get_openai_client")
+    def test_query_openai_reads_config_snapshot_after_settings_change(self, mock_get_client):
+        captured = {}
+
+        class DummyResponses:
+            def create(self, **kwargs):
+                captured.update(kwargs)
+                return SimpleNamespace(output_text="ok")
+
+        mock_get_client.return_value = SimpleNamespace(responses=DummyResponses())
+        with self.settings(RECOMMENDER_OPENAI_MODEL="snapshot-model", RECOMMENDER_OPENAI_MAX_TOKENS=64):
+            query_openai("prompt")
+        self.assertEqual(captured["model"], "snapshot-model")
+        self.assertEqual(captured["max_output_tokens"], 64)
+        query_openai("prompt")
+        self.assertEqual(captured["model"], settings.RECOMMENDER_OPENAI_MODEL)
+
     @patch("recommender.services.llm_handler._get_openai_client")
     def test_query_openai_collects_segmented_output(self, mock_get_client):
         class DummyContent:
@@ -1343,7 +1942,76 @@ class LLMHandlerTests(TestCase):
         output = query_openai("prompt")
         self.assertEqual(output, "Line1Line2")
 
-    @patch("recommender.services.llm_handler.query_openai", return_value="openai-response")
+    @patch("recommender.services.llm_handler._get_openai_client")
+    def test_query_openai_streams_until_stop_condition(self, mock_get_client):
+        closed = []
+
+        class DummyStream:
+            def __iter__(self):
+                for delta in ['[{"title": "A", "artist": "B"}', "]", " trailing commentary"]:
+                    yield SimpleNamespace(type="response.output_text.delta", delta=delta)
+
+            def close(self):
+                closed.append(True)
+
+        class DummyResponses:
+            def create(self, **kwargs):
+                self.kwargs = kwargs
+                return DummyStream()
+
+        responses = DummyResponses()
+        client = SimpleNamespace(responses=responses)
+        client.with_options = lambda **_options: client
+        mock_get_client.return_value = client
+        reset_llm_usage_tracker()
+        output = query_openai("prompt", stop_on=_json_array_closed)
+        self.assertEqual(output, '[{"title": "A", "artist": "B"}]')
+        self.assertTrue(responses.kwargs["stream"])
+        self.assertEqual(closed, [True])
+        self.assertEqual(
+            get_llm_usage_snapshot(),
+            {"prompt_tokens": 2, "completion_tokens": 8, "total_tokens": 10},
+        )
+
+    @patch("recommender.services.llm_handler._get_openai_client")
+    def test_query_openai_stream_records_reported_usage(self, mock_get_client):
+        usage = SimpleNamespace(input_tokens=40, output_tokens=12, total_tokens=52)
+        events = [
+            SimpleNamespace(type="response.created", response=SimpleNamespace(usage=None)),
+            SimpleNamespace(type="response.output_text.delta", delta='["A - B"'),
+            SimpleNamespace(type="response.completed", response=SimpleNamespace(usage=usage)),
+        ]
+
+        class DummyResponses:
+            def create(self, **kwargs):
+                return iter(events)
+
+        client = SimpleNamespace(responses=DummyResponses())
+        client.with_options = lambda **_options: client
+        mock_get_client.return_value = client
+        reset_llm_usage_tracker()
+        self.assertEqual(query_openai("prompt", stop_on=_json_array_closed), '["A - B"')
+        self.assertEqual(
+            get_llm_usage_snapshot(),
+            {"prompt_tokens": 40, "completion_tokens": 12, "total_tokens": 52},
+        )
+
+    def test_json_array_closed_ignores_bracketed_prose(self):
+        self.assertFalse(_json_array_closed("Here are [5]"))
+        self.assertFalse(_json_array_closed('[{"title": "A"}'))
+        self.assertTrue(_json_array_closed('Sure:\n["A - B"]'))
+
+    def test_track_array_limit_stops_after_enough_entries(self):
+        stop = functools.partial(_track_array_limit_reached, 2)
+        partial = '[{"title": "A}", "artist": "x"}, {"title": "B", "artist": "y"}'
+        self.assertFalse(stop(partial[:32]))
+        self.assertTrue(stop(partial))
+        self.assertEqual(
+            _parse_json_response(partial + ', {"title": "C'),
+            [{"title": "A}", "artist": "x"}, {"title": "B", "artist": "y"}],
+        )
+
+    @patch("recommender.services.llm_handler._query_openai", return_value=("openai-response", True))
     def test_dispatch_llm_query_defaults_to_openai(self, mock_openai):
         result = dispatch_llm_query("prompt", provider="unknown", temperature=0.5, max_output_tokens=256)
         self.assertEqual(result, "openai-response")
@@ -1653,6 +2321,17 @@ class ViewHelperTests(TestCase):
         self.assertTrue(debug_steps[0].endswith("Seed pipeline started."))
         self.assertTrue(debug_steps[1].endswith("Error: missing artist metadata."))
 
+    def test_resolve_request_user_id_is_memoized_per_request(self):
+        request = SimpleNamespace(
+            user=SimpleNamespace(is_authenticated=False),
+            session={"spotify_user_id": "listener-1"},
+        )
+        self.assertEqual(resolve_request_user_id(request), "listener-1")
+        request.session["spotify_user_id"] = "stale-write"
+        self.assertEqual(resolve_request_user_id(request), "listener-1")
+        remember_spotify_user_id(request, "listener-2")
+        self.assertEqual(resolve_request_user_id(request), "listener-2")
+
     @override_settings(RECOMMENDER_DEBUG_VIEW_ENABLED=False)
     def test_build_context_from_payload_converts_legacy_fields(self):
         payload = {
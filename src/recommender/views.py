@@ -18,7 +18,6 @@ from typing import Callable, Dict, List, Optional, Set
 
 import requests as requests_lib
 from PIL import Image
-import spotipy
 from django.conf import settings
 from django.contrib import messages
 from django.core.cache import cache
@@ -32,12 +31,16 @@ from spotipy import SpotifyException
 from .models import SavedPlaylist, PlaylistGenerationStat
 from .services.llm_handler import (
     extract_playlist_attributes,
+    plan_playlist,
     suggest_seed_tracks,
     suggest_remix_tracks,
-    get_llm_usage_snapshot,
-    reset_llm_usage_tracker,
 )
-from .services.session_utils import ensure_session_key, resolve_request_user_id
+from .services.llm_streaming import get_llm_usage_snapshot, reset_llm_usage_tracker
+from .services.session_utils import (
+    ensure_session_key,
+    remember_spotify_user_id,
+    resolve_request_user_id,
+)
 from .services.spotify_handler import (
     cached_tracks_for_genre,
     ensure_artist_seed,
@@ -47,7 +50,9 @@ from .services.spotify_handler import (
     resolve_seed_tracks,
     create_playlist_with_tracks,
     compute_playlist_statistics,
+    _artist_label,
     _serialize_track_payload,
+    _spotify_client,
 )
 from .services.user_preferences import (
     describe_pending_options,
@@ -56,6 +61,7 @@ from .services.user_preferences import (
 
 logger = logging.getLogger(__name__)
 PLAYLIST_NAME_MAX_LENGTH = 100
+LLM_SEED_SUGGESTIONS = 5
 
 
 def _persist_generation_stat(
@@ -544,8 +550,9 @@ def generate_playlist(request):
             "llm_provider": llm_provider,
         }
     else:
-        attributes = extract_playlist_attributes(
+        attributes, prefetched_seeds = plan_playlist(
             prompt,
+            LLM_SEED_SUGGESTIONS,
             debug_steps=debug_steps,
             log_step=log,
             provider=llm_provider,
@@ -653,7 +660,9 @@ def generate_playlist(request):
             attributes,
             debug_steps=debug_steps,
             log_step=log,
+            max_suggestions=LLM_SEED_SUGGESTIONS,
             provider=llm_provider,
+            prefetched=prefetched_seeds,
         )
         llm_seed_tracks = resolve_seed_tracks(
             llm_suggestions,
@@ -1425,7 +1434,7 @@ def save_playlist(request):
         playlist_id = result.get("playlist_id")
         resolved_user_id = result.get("user_id")
         if resolved_user_id:
-            request.session["spotify_user_id"] = resolved_user_id
+            remember_spotify_user_id(request, resolved_user_id)
         resolved_display_name = result.get("user_display_name")
         if resolved_display_name:
             request.session["spotify_display_name"] = resolved_display_name
@@ -1434,7 +1443,7 @@ def save_playlist(request):
         cover_image_url = payload.get("cover_image_url")
         if playlist_id and cover_image_url:
             try:
-                sp = spotipy.Spotify(auth=access_token)
+                sp = _spotify_client(access_token)
 
                 # Download the image from the URL
                 logger.info("Downloading cover image from %s", cover_image_url)
@@ -1487,7 +1496,7 @@ def save_playlist(request):
 
         if playlist_id and resolved_user_id and resolved_display_name:
             try:
-                sp = spotipy.Spotify(auth=access_token)
+                sp = _spotify_client(access_token)
                 spotify_playlist = sp.playlist(playlist_id)
 
                 cover_image = ""
@@ -1581,7 +1590,7 @@ def search_songs(request):
         )
 
     try:
-        sp = spotipy.Spotify(auth=access_token)
+        sp = _spotify_client(access_token)
 
         # Search for tracks
         search_result = sp.search(q=query, type="track", limit=10, market="US")
@@ -1595,11 +1604,6 @@ def search_songs(request):
 
             album = track.get("album") or {}
             artists = track.get("artists") or []
-            artist_names = ", ".join(
-                artist.get("name", "")
-                for artist in artists
-                if artist.get("name")
-            )
 
             # Get album image
             images = album.get("images", [])
@@ -1611,7 +1615,7 @@ def search_songs(request):
                 {
                     "id": track.get("id"),
                     "name": track.get("name", "Unknown"),
-                    "artists": artist_names or "Unknown",
+                    "artists": _artist_label(track),
                     "album_name": album.get("name", ""),
                     "album_image_url": album_image_url,
                     "duration_ms": int(track.get("duration_ms") or 0),
@@ -1689,7 +1693,7 @@ def add_song_to_playlist(request):
         )
 
     try:
-        sp = spotipy.Spotify(auth=access_token)
+        sp = _spotify_client(access_token)
         track = sp.track(track_id)
 
         if not track or not track.get("id"):
@@ -1698,8 +1702,7 @@ def add_song_to_playlist(request):
                 status=404,
             )
 
-        new_track = _serialize_track_payload(track)
-        new_track["seed_source"] = "manual_search"
+        new_track = _serialize_track_payload(track, seed_source="manual_search")
 
         # Add track to the end of the playlist
         track_details.append(new_track)
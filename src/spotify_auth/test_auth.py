@@ -11,6 +11,7 @@ from django.test import Client, TestCase
 from django.urls import reverse
 from requests.exceptions import RequestException
 from spotipy.exceptions import SpotifyException
+from recommender.services.spotify_handler import _shared_requests_session
 from spotify_auth.views import SpotifyCallbackView
 
 
@@ -767,4 +768,6 @@ class SpotifyDashboardViewTests(TestCase):
         self.client.get(self.dashboard_url)
 
         # Verify Spotify client was created with correct token
-        mock_spotify.assert_called_once_with(auth='my_test_token')
+        mock_spotify.assert_called_once_with(
+            auth='my_test_token', requests_session=_shared_requests_session()
+        )